@@ -0,0 +1,106 @@
+import itertools
+import random
+from collections import namedtuple
+
+from causal_explainer.halpern_pearl.causes import CausalNetwork, PrimitiveEvent
+
+# synthetic causal models of parameterized size, where contexts[0] is the actual context and event holds in it,
+# foil is an alternative to event for contrastive queries, and every context is an element of the epistemic state for explanations
+Workload = namedtuple("Workload", ["causal_network", "exogenous_domains", "endogenous_domains", "contexts", "event", "foil"])
+
+
+def copy_of(parent_variable):
+    return lambda parent_values: parent_values[parent_variable]
+
+
+def finish(causal_network, exogenous_domains, endogenous_domains, contexts, event_variable):
+    actual_value = causal_network.evaluate(contexts[0])[event_variable]
+    foil_value = sorted(endogenous_domains[event_variable] - {actual_value}, key=repr)[0]
+    return Workload(causal_network, exogenous_domains, endogenous_domains, contexts, PrimitiveEvent(event_variable, actual_value), PrimitiveEvent(event_variable, foil_value))
+
+
+def sample_contexts(exogenous_domains, num_contexts, actual_context, seed):
+    rng = random.Random(seed)
+    contexts = [actual_context]
+    while len(contexts) < num_contexts:
+        contexts.append({exogenous_variable: rng.choice(sorted(domain, key=repr)) for exogenous_variable, domain in exogenous_domains.items()})
+    return contexts
+
+
+def majority_vote(num_voters, num_contexts=4, seed=0):  # n voters choose between two candidates, as in examples/voting.py
+    exogenous_domains = {f"U_V{i}": {"Suzy", "Billy"} for i in range(num_voters)}
+    endogenous_domains = {**{f"V{i}": {"Suzy", "Billy"} for i in range(num_voters)}, "W": {"Suzy", "Billy", "tie"}}
+    voters = [f"V{i}" for i in range(num_voters)]
+    causal_network = CausalNetwork()
+    for i in range(num_voters):
+        causal_network.add_dependency(f"V{i}", [f"U_V{i}"], copy_of(f"U_V{i}"))
+
+    def winner(parent_values):
+        suzy = sum(parent_values[voter] == "Suzy" for voter in voters)
+        return "Suzy" if suzy > num_voters / 2 else "Billy" if num_voters - suzy > num_voters / 2 else "tie"
+    causal_network.add_dependency("W", voters, winner)
+    actual_context = {f"U_V{i}": "Suzy" if i <= num_voters // 2 else "Billy" for i in range(num_voters)}  # Suzy wins by one or two votes
+    return finish(causal_network, exogenous_domains, endogenous_domains, sample_contexts(exogenous_domains, num_contexts, actual_context, seed), "W")
+
+
+def chain(length, num_contexts=4, seed=0):  # X0 -> X1 -> ... where each variable copies its predecessor
+    exogenous_domains = {"U": {False, True}}
+    endogenous_domains = {f"X{i}": {False, True} for i in range(length)}
+    causal_network = CausalNetwork()
+    causal_network.add_dependency("X0", ["U"], copy_of("U"))
+    for i in range(1, length):
+        causal_network.add_dependency(f"X{i}", [f"X{i - 1}"], copy_of(f"X{i - 1}"))
+    return finish(causal_network, exogenous_domains, endogenous_domains, sample_contexts(exogenous_domains, num_contexts, {"U": True}, seed), f"X{length - 1}")
+
+
+def tree(num_leaves, disjunctive=True, num_contexts=4, seed=0):  # binary tree of or-gates (disjunctive=True) or and-gates over num_leaves leaves
+    exogenous_domains = {f"U_L{i}": {False, True} for i in range(num_leaves)}
+    endogenous_domains = {f"L{i}": {False, True} for i in range(num_leaves)}
+    causal_network = CausalNetwork()
+    layer = []
+    for i in range(num_leaves):
+        causal_network.add_dependency(f"L{i}", [f"U_L{i}"], copy_of(f"U_L{i}"))
+        layer.append(f"L{i}")
+    gates = itertools.count()
+    while len(layer) > 1:
+        next_layer = []
+        for left, right in zip(layer[::2], layer[1::2]):
+            gate = f"G{next(gates)}"
+            endogenous_domains[gate] = {False, True}
+            if disjunctive:
+                causal_network.add_dependency(gate, [left, right], lambda parent_values, left=left, right=right: parent_values[left] or parent_values[right])
+            else:
+                causal_network.add_dependency(gate, [left, right], lambda parent_values, left=left, right=right: parent_values[left] and parent_values[right])
+            next_layer.append(gate)
+        layer = next_layer + layer[len(layer) - len(layer) % 2:]  # an odd one out moves up unchanged
+    actual_context = {exogenous_variable: True for exogenous_variable in exogenous_domains}
+    return finish(causal_network, exogenous_domains, endogenous_domains, sample_contexts(exogenous_domains, num_contexts, actual_context, seed), layer[0])
+
+
+def random_dag(num_variables, k=2, max_parents=3, num_contexts=4, seed=0):  # random structure over k-valued variables, each with its own exogenous parent and a random table as equation
+    rng = random.Random(seed)
+    domain = {False, True} if k == 2 else set(range(k))
+    exogenous_domains = {f"U{i}": set(domain) for i in range(num_variables)}
+    endogenous_domains = {f"X{i}": set(domain) for i in range(num_variables)}
+    causal_network = CausalNetwork()
+    for i in range(num_variables):
+        parents = [f"U{i}"] + [f"X{j}" for j in sorted(rng.sample(range(i), min(i, rng.randint(0, max_parents))))]
+        table = {parent_values_tuple: rng.choice(sorted(domain)) for parent_values_tuple in itertools.product(*(sorted(domain) for _ in parents))}
+        causal_network.add_dependency(f"X{i}", parents, lambda parent_values, parents=parents, table=table: table[tuple(parent_values[parent_variable] for parent_variable in parents)])
+    actual_context = {exogenous_variable: rng.choice(sorted(domain)) for exogenous_variable in exogenous_domains}
+    return finish(causal_network, exogenous_domains, endogenous_domains, sample_contexts(exogenous_domains, num_contexts, actual_context, seed), f"X{num_variables - 1}")
+
+
+def epistemic(num_contexts, num_variables=4, k=2, seed=0):  # random_dag with an epistemic state of num_contexts sampled contexts
+    return random_dag(num_variables, k=k, num_contexts=num_contexts, seed=seed)
+
+
+generators = {  # family name to generator of a workload of a given size
+    "majority_vote": majority_vote,
+    "chain": chain,
+    "disjunctive_tree": lambda size: tree(size, disjunctive=True),
+    "conjunctive_tree": lambda size: tree(size, disjunctive=False),
+    "random_dag": random_dag,
+    "random_dag_3": lambda size: random_dag(size, k=3),
+    "epistemic": epistemic,
+}
@@ -0,0 +1,119 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from causal_explainer.benchmarks.generators import generators
+from causal_explainer.chockler_halpern.responsibility import degrees_of_responsibility
+from causal_explainer.halpern_pearl.causes import CausalSetting, search_candidate_causes, is_actual_cause, is_sufficient_cause
+from causal_explainer.halpern_pearl.explanations import EpistemicState, search_candidate_explanations, is_explanation
+from causal_explainer.miller.contrastive_causes import find_contrastive_counterfactual_causes
+from causal_explainer.miller.contrastive_explanations import find_contrastive_counterfactual_explanations
+
+# times each query on workloads of growing size, e.g. python -m causal_explainer.benchmarks.runner --output results.json,
+# then python -m causal_explainer.benchmarks.runner --compare results.json on another commit
+
+
+def causal_setting(workload):
+    return CausalSetting(workload.causal_network, workload.contexts[0], workload.exogenous_domains, workload.endogenous_domains)
+
+
+def epistemic_state(workload):
+    return EpistemicState(workload.causal_network, workload.contexts, workload.exogenous_domains, workload.endogenous_domains)
+
+
+queries = {  # query name to function of a workload returning the number of results
+    "actual_causes": lambda workload: len(list(search_candidate_causes(workload.event, causal_setting(workload), is_actual_cause))),
+    "sufficient_causes": lambda workload: len(list(search_candidate_causes(workload.event, causal_setting(workload), is_sufficient_cause))),
+    "responsibility": lambda workload: sum(1 for values in degrees_of_responsibility(workload.event, causal_setting(workload)).values() for degree in values.values() if degree),
+    "explanations": lambda workload: len(list(search_candidate_explanations(workload.event, epistemic_state(workload), is_explanation))),
+    "contrastive_causes": lambda workload: len(list(find_contrastive_counterfactual_causes((workload.event, workload.foil), causal_setting(workload)))),
+    "contrastive_explanations": lambda workload: len(list(find_contrastive_counterfactual_explanations((workload.event, workload.foil), epistemic_state(workload)))),
+}
+
+default_sizes = {  # small steps, as the searches are exponential in the number of variables and run stops once a size is too slow
+    "majority_vote": list(range(3, 16, 2)),
+    "chain": list(range(2, 21, 2)),
+    "disjunctive_tree": list(range(2, 17)),
+    "conjunctive_tree": list(range(2, 17)),
+    "random_dag": list(range(3, 13)),
+    "random_dag_3": list(range(3, 9)),
+    "epistemic": [2, 4, 8, 16, 32, 64],
+}
+
+
+def measure(family, size, query, memory=True, max_seconds=None):  # each measurement builds a fresh workload so that no caches are shared between measurements
+    workload = generators[family](size)
+    start = time.perf_counter()
+    num_results = queries[query](workload)
+    seconds = time.perf_counter() - start
+    peak_bytes = None
+    if memory and (max_seconds is None or seconds <= max_seconds):  # measured in a separate run, as tracing allocations slows the query down
+        workload = generators[family](size)
+        tracemalloc.start()
+        try:
+            queries[query](workload)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {"family": family, "size": size, "query": query, "seconds": seconds, "peak_bytes": peak_bytes, "results": num_results}
+
+
+def run(families, query_names, sizes=None, max_seconds=10.0, memory=True):  # sizes of a family stop growing for a query once it takes longer than max_seconds
+    for query in query_names:  # warm up lazy imports, which would otherwise be charged to the first measurement
+        queries[query](generators["chain"](2))
+    for family in families:
+        for query in query_names:
+            for size in (sizes or default_sizes[family]):
+                result = measure(family, size, query, memory, max_seconds)
+                yield result
+                if result["seconds"] > max_seconds:
+                    break
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark causal queries on synthetic causal models of growing size")
+    parser.add_argument("--families", nargs="+", choices=sorted(generators), default=sorted(generators))
+    parser.add_argument("--queries", nargs="+", choices=sorted(queries), default=sorted(queries))
+    parser.add_argument("--sizes", nargs="+", type=int, help="sizes for every family instead of the defaults")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="stop growing a family for a query once a size takes longer")
+    parser.add_argument("--no-memory", action="store_true", help="skip measuring peak memory")
+    parser.add_argument("--output", help="path to write results to as JSON")
+    parser.add_argument("--compare", help="path of JSON results to compare against, e.g. from another commit")
+    args = parser.parse_args(argv)
+
+    baseline = dict()
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = {(result["family"], result["size"], result["query"]): result for result in json.load(file)["results"]}
+
+    results = []
+    for result in run(args.families, args.queries, args.sizes, args.max_seconds, not args.no_memory):
+        results.append(result)
+        line = f"{result['family']:>18} {result['size']:>4} {result['query']:>25} {result['seconds']:>10.4f}s {result['results']:>6} results"
+        if result["peak_bytes"] is not None:
+            line += f" {result['peak_bytes'] / 2 ** 20:>9.2f}MiB"
+        previous = baseline.get((result["family"], result["size"], result["query"]))
+        if previous is not None:
+            line += f" {result['seconds'] / previous['seconds'] if previous['seconds'] else float('inf'):>7.2f}x time"
+            if previous["results"] != result["results"]:
+                line += f" (results differ: {previous['results']})"
+        print(line, flush=True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"revision": revision(), "python": platform.python_version(), "platform": platform.platform(), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,28 @@
-from causal_explainer.halpern_pearl.causes import search_candidate_causes, is_actual_cause, find_witnesses_ac2
+from causal_explainer.halpern_pearl.causes import search_candidate_causes, is_actual_cause, find_smallest_witness_ac2
 
 
 def degree_of_responsibility(endogenous_variable, value, event, causal_setting):
-    k_values = set()
+    k = None
     for actual_cause in search_candidate_causes(event, causal_setting, is_actual_cause):
         if endogenous_variable in actual_cause and actual_cause[endogenous_variable] == value:  # if endogenous_variable=value is "part of" this cause
-            k_values.add(min(len(witness) for witness in find_witnesses_ac2(actual_cause, event, causal_setting)))
-    return 1 / min(k_values) if k_values else 0
+            witness = find_smallest_witness_ac2(actual_cause, event, causal_setting, bound=k)  # only interested in witnesses smaller than the best so far
+            if witness is not None:
+                k = len(witness)
+    return 1 / k if k else 0
 
 
-def degrees_of_responsibility(event, causal_setting):
-    return {endogenous_variable: {value: degree_of_responsibility(endogenous_variable, value, event, causal_setting) for value in domain} for endogenous_variable, domain in causal_setting.endogenous_domains.items()}
+def find_minimal_witness_sizes(event, causal_setting):  # pairs of each actual cause with the size of its smallest witness
+    return [(actual_cause, len(find_smallest_witness_ac2(actual_cause, event, causal_setting))) for actual_cause in search_candidate_causes(event, causal_setting, is_actual_cause)]  # every actual cause has a witness by AC2
+
+
+def degrees_of_responsibility(event, causal_setting):  # finds the actual causes and their smallest witnesses once for all variable=value pairs
+    k_values = dict()
+    for actual_cause, k in find_minimal_witness_sizes(event, causal_setting):
+        for variable, value in actual_cause.items():
+            if (variable, value) not in k_values or k < k_values[variable, value]:
+                k_values[variable, value] = k
+    return {endogenous_variable: {value: 1 / k_values[endogenous_variable, value] if (endogenous_variable, value) in k_values else 0 for value in domain} for endogenous_variable, domain in causal_setting.endogenous_domains.items()}
+
+
+def batch_degrees_of_responsibility(events, causal_setting):  # events over the same variables also share counterfactual evaluations through the cache of the network
+    return [degrees_of_responsibility(event, causal_setting) for event in events]
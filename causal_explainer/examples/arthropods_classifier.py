@@ -39,6 +39,7 @@ if __name__ == "__main__":
     )
     causal_network.add_dependency('A', ['U_A'], lambda parent_values: parent_values['U_A'])
     causal_network.add_dependency('V', ['O', 'A'], lambda parent_values: "pass" if parent_values['O'] == parent_values['A'] or parent_values['O'] == "unknown" or parent_values['A'] == "unknown" else "fail")
+    causal_network.tabulate({**exogenous_domains, **endogenous_domains})  # look up each equation rather than re-run its chain of checks
     context = {'U_L': 7, 'U_S': False, 'U_E': 8, 'U_C': False, 'U_W': 0, 'U_A': "unknown"}
     causal_setting = CausalSetting(causal_network, context, exogenous_domains, endogenous_domains)
     event = PrimitiveEvent('V', "pass")
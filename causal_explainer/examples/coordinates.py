@@ -0,0 +1,44 @@
+from causal_explainer.halpern_pearl.causes import CausalNetwork, CausalSetting, PrimitiveEvent, search_candidate_causes, \
+    is_actual_cause, is_sufficient_cause
+from causal_explainer.chockler_halpern.responsibility import degrees_of_responsibility
+from causal_explainer.halpern_pearl.explanations import EpistemicState, search_candidate_explanations, is_explanation
+from causal_explainer.utils import freeze
+
+if __name__ == "__main__":
+    exogenous_domains = {
+        'U_C': {(0, 0), (1, 1)}
+    }
+    endogenous_domains = {
+        'C': exogenous_domains['U_C'],  # coordinates commanded to a drone
+        'T': {(0, 0), (1, 1)},  # target the drone flies to
+        'P': {(0, 0), (1, 1)}  # position the drone lands at
+    }
+    causal_network = CausalNetwork()
+    causal_network.add_dependency('C', ['U_C'], lambda parent_values: parent_values['U_C'])
+    causal_network.add_dependency('T', ['C'], lambda parent_values: parent_values['C'])
+    causal_network.add_dependency('P', ['T'], lambda parent_values: parent_values['T'])
+    context = {'U_C': (1, 1)}
+    causal_setting = CausalSetting(causal_network, context, exogenous_domains, endogenous_domains)
+    event = PrimitiveEvent('P', (1, 1))  # values are tuples, which are compared as a whole rather than element by element
+
+    actual_causes = freeze(search_candidate_causes(event, causal_setting, is_actual_cause))
+    expected_actual_causes = freeze([{'C': (1, 1)}, {'T': (1, 1)}, {'P': (1, 1)}])
+    assert actual_causes == expected_actual_causes
+
+    sufficient_causes = freeze(search_candidate_causes(event, causal_setting, is_sufficient_cause))
+    expected_sufficient_causes = freeze([{'C': (1, 1)}, {'T': (1, 1)}, {'P': (1, 1)}])
+    assert sufficient_causes == expected_sufficient_causes
+
+    epistemic_state = EpistemicState(causal_network, [{'U_C': (1, 1)}, {'U_C': (0, 0)}], exogenous_domains, endogenous_domains)
+    explanations = freeze(search_candidate_explanations(event, epistemic_state, is_explanation))
+    expected_explanations = freeze([{'C': (1, 1)}, {'T': (1, 1)}, {'P': (1, 1)}])
+    assert explanations == expected_explanations
+
+    array_network = CausalNetwork()  # identical equations, also applied to arrays, so that AC2 checks potential witnesses in vectorized sweeps over tuple values
+    for variable, parent_variable in [('C', 'U_C'), ('T', 'C'), ('P', 'T')]:
+        structural_equation = (lambda parent_variable: lambda parent_values: parent_values[parent_variable])(parent_variable)
+        array_network.add_dependency(variable, [parent_variable], structural_equation, array_equation=structural_equation)
+    assert array_network.compile().vectorizable
+    array_setting = CausalSetting(array_network, context, exogenous_domains, endogenous_domains)
+    assert freeze(search_candidate_causes(event, array_setting, is_actual_cause)) == expected_actual_causes
+    assert degrees_of_responsibility(event, array_setting) == degrees_of_responsibility(event, causal_setting)
@@ -0,0 +1,57 @@
+from causal_explainer.halpern_pearl.causes import CausalNetwork, CausalSetting, PrimitiveEvent, search_candidate_causes, \
+    is_actual_cause, is_sufficient_cause
+from causal_explainer.chockler_halpern.responsibility import degrees_of_responsibility
+from causal_explainer.utils import freeze
+
+
+def rock_throwing_network(sat_solver):
+    causal_network = CausalNetwork(sat_solver=sat_solver)
+    causal_network.add_dependency('ST', ['U_ST'], lambda parent_values: parent_values['U_ST'])
+    causal_network.add_dependency('BT', ['U_BT'], lambda parent_values: parent_values['U_BT'])
+    causal_network.add_dependency('SH', ['ST'], lambda parent_values: parent_values['ST'])
+    causal_network.add_dependency('BH', ['BT', 'SH'], lambda parent_values: parent_values['BT'] and not parent_values['SH'])
+    causal_network.add_dependency('BS', ['SH', 'BH'], lambda parent_values: parent_values['SH'] or parent_values['BH'])
+    return causal_network
+
+
+if __name__ == "__main__":
+    exogenous_domains = {
+        'U_ST': {False, True},
+        'U_BT': {False, True}
+    }
+    endogenous_domains = {
+        'ST': exogenous_domains['U_ST'],
+        'BT': exogenous_domains['U_BT'],
+        'SH': {False, True},
+        'BH': {False, True},
+        'BS': {False, True}
+    }
+    sat_network = rock_throwing_network(sat_solver=True)  # every domain is {False, True}, so AC2 and SC3 are decided by satisfiability
+    enumerative_network = rock_throwing_network(sat_solver=False)
+    event = PrimitiveEvent('BS', True)
+
+    context = {'U_ST': True, 'U_BT': True}
+    causal_setting = CausalSetting(sat_network, context, exogenous_domains, endogenous_domains)
+
+    actual_causes = freeze(search_candidate_causes(event, causal_setting, is_actual_cause))
+    expected_actual_causes = freeze([{'ST': True}, {'BS': True}, {'SH': True}])
+    assert actual_causes == expected_actual_causes
+
+    responsibility = degrees_of_responsibility(event, causal_setting)
+    expected_responsibility = {
+        'ST': {False: 0, True: 1 / 2},  # the smallest witness {ST=0, BH=0} holds BH at its actual value 0
+        'BT': {False: 0, True: 0},
+        'SH': {False: 0, True: 1 / 2},
+        'BH': {False: 0, True: 0},
+        'BS': {False: 0, True: 1}
+    }
+    assert responsibility == expected_responsibility
+
+    for u_st in [False, True]:  # the satisfiability backend agrees with enumeration in every context
+        for u_bt in [False, True]:
+            context = {'U_ST': u_st, 'U_BT': u_bt}
+            sat_setting = CausalSetting(sat_network, context, exogenous_domains, endogenous_domains)
+            enumerative_setting = CausalSetting(enumerative_network, context, exogenous_domains, endogenous_domains)
+            for is_cause in [is_actual_cause, is_sufficient_cause]:
+                assert freeze(search_candidate_causes(event, sat_setting, is_cause)) == freeze(search_candidate_causes(event, enumerative_setting, is_cause))
+            assert degrees_of_responsibility(event, sat_setting) == degrees_of_responsibility(event, enumerative_setting)
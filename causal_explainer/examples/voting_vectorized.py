@@ -0,0 +1,60 @@
+import itertools
+
+import numpy
+
+from causal_explainer.halpern_pearl.causes import CausalNetwork, CausalSetting, PrimitiveEvent, search_candidate_causes, \
+    is_actual_cause, is_sufficient_cause
+from causal_explainer.chockler_halpern.responsibility import degrees_of_responsibility
+from causal_explainer.utils import freeze
+
+
+def voting_network(U, V, W, array_equations):  # array_equations=True gives every dependency an array form, so AC2 checks potential witnesses in vectorized sweeps
+    causal_network = CausalNetwork()
+    for i in range(len(V)):
+        structural_equation = (lambda i: lambda parent_values: parent_values[U[i]])(i)  # WARNING: https://stackoverflow.com/questions/19837486/lambda-in-a-loop
+        causal_network.add_dependency(V[i], [U[i]], structural_equation, structural_equation if array_equations else None)  # also a function of arrays
+    structural_equation = lambda parent_values: \
+        "Suzy" if len([v for v in V if parent_values[v] == "Suzy"]) > (len(V) / 2) else "Billy" if len([v for v in V if parent_values[v] == "Billy"]) > (len(V) / 2) else "tie"
+    array_equation = lambda parent_values: \
+        numpy.where(sum(parent_values[v] == "Suzy" for v in V) > (len(V) / 2), "Suzy", numpy.where(sum(parent_values[v] == "Billy" for v in V) > (len(V) / 2), "Billy", "tie"))
+    causal_network.add_dependency(W, V, structural_equation, array_equation if array_equations else None)
+    return causal_network
+
+
+if __name__ == "__main__":
+    num_voters = 5
+    U = [f'U_V{i+1}' for i in range(num_voters)]
+    V, W = [f'V{i+1}' for i in range(num_voters)], 'W'
+    exogenous_domains = {u: {"Suzy", "Billy"} for u in U}
+    endogenous_domains = {
+        **{v: {"Suzy", "Billy"} for v in V},
+        W: {"Suzy", "Billy", "tie"}
+    }
+    array_network = voting_network(U, V, W, array_equations=True)
+    scalar_network = voting_network(U, V, W, array_equations=False)
+    assert array_network.compile().vectorizable and not scalar_network.compile().vectorizable
+
+    context = {**{u: "Suzy" for u in U[:4]}, **{u: "Billy" for u in U[4:]}}  # Suzy wins 4-1
+    causal_setting = CausalSetting(array_network, context, exogenous_domains, endogenous_domains)
+    event = PrimitiveEvent(W, "Suzy")
+
+    actual_causes = freeze(search_candidate_causes(event, causal_setting, is_actual_cause))
+    expected_actual_causes = freeze([{v_i: "Suzy", v_j: "Suzy"} for v_i, v_j in itertools.combinations(V[:4], 2)] + [{W: "Suzy"}])
+    assert actual_causes == expected_actual_causes
+
+    responsibility = degrees_of_responsibility(event, causal_setting)
+    expected_responsibility = {
+        **{v: {"Suzy": 1 / 2, "Billy": 0} for v in V[:4]},  # two of Suzy's votes have to change for her to lose
+        V[4]: {"Suzy": 0, "Billy": 0},
+        W: {"Suzy": 1, "Billy": 0, "tie": 0}
+    }
+    assert responsibility == expected_responsibility
+
+    for values in itertools.product(["Suzy", "Billy"], repeat=num_voters):  # the vectorized sweep agrees with scalar evaluation in every context
+        context = dict(zip(U, values))
+        array_setting = CausalSetting(array_network, context, exogenous_domains, endogenous_domains)
+        scalar_setting = CausalSetting(scalar_network, context, exogenous_domains, endogenous_domains)
+        event = PrimitiveEvent(W, scalar_setting.values[W])
+        for is_cause in [is_actual_cause, is_sufficient_cause]:
+            assert freeze(search_candidate_causes(event, array_setting, is_cause)) == freeze(search_candidate_causes(event, scalar_setting, is_cause))
+        assert degrees_of_responsibility(event, array_setting) == degrees_of_responsibility(event, scalar_setting)
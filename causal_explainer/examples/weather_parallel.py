@@ -0,0 +1,68 @@
+import itertools
+
+from causal_explainer.halpern_pearl.causes import CausalNetwork, CausalSetting, PrimitiveEvent, Disjunction, search_candidate_causes, \
+    is_actual_cause, is_sufficient_cause
+from causal_explainer.halpern_pearl.explanations import EpistemicState, search_candidate_explanations, is_explanation
+from causal_explainer.miller.contrastive_causes import find_contrastive_counterfactual_causes
+from causal_explainer.utils import freeze
+
+
+def weather_network():  # as in examples/weather.py
+    causal_network = CausalNetwork()
+    causal_network.add_dependency('AS', ['U_AS'], lambda parent_values: parent_values['U_AS'])
+    causal_network.add_dependency('ES_M', ['U_ES_M'], lambda parent_values: parent_values['U_ES_M'])
+    causal_network.add_dependency('ES_J', ['U_ES_J'], lambda parent_values: parent_values['U_ES_J'])
+    causal_network.add_dependency('FF_M', ['AS', 'ES_M'], lambda parent_values: parent_values['ES_M'] and not parent_values['AS'])
+    causal_network.add_dependency('FF_J', ['AS', 'ES_M', 'ES_J'], lambda parent_values: parent_values['ES_J'] and (parent_values['AS'] or not parent_values['ES_M']))
+    return causal_network
+
+
+if __name__ == "__main__":  # the guard is required, as worker processes may import this module
+    exogenous_domains = {
+        'U_AS': {False, True},
+        'U_ES_M': {False, True},
+        'U_ES_J': {False, True}
+    }
+    endogenous_domains = {
+        'AS': exogenous_domains['U_AS'],
+        'ES_M': exogenous_domains['U_ES_M'],
+        'ES_J': exogenous_domains['U_ES_J'],
+        'FF_M': {False, True},
+        'FF_J': {False, True}
+    }
+    causal_network = weather_network()
+    context = {'U_AS': False, 'U_ES_M': True, 'U_ES_J': True}
+    causal_setting = CausalSetting(causal_network, context, exogenous_domains, endogenous_domains)
+    fact = PrimitiveEvent('FF_M', True)
+    foil = PrimitiveEvent('FF_J', True)
+    processes, chunk_size = 2, 1  # single candidates (or variable subsets) per chunk, so that every search is spread over many chunks
+    # parallel searches run on fresh networks, as forked workers would otherwise inherit the memos of the sequential searches
+
+    actual_causes = list(search_candidate_causes(fact, causal_setting, is_actual_cause))
+    assert freeze(actual_causes) == freeze([{'AS': False}, {'ES_M': True}, {'FF_M': True}])
+    parallel_setting = CausalSetting(weather_network(), context, exogenous_domains, endogenous_domains)
+    assert list(search_candidate_causes(fact, parallel_setting, is_actual_cause, processes=processes, chunk_size=chunk_size)) == actual_causes
+    parallel_setting = CausalSetting(weather_network(), context, exogenous_domains, endogenous_domains)
+    assert freeze(search_candidate_causes(fact, parallel_setting, is_actual_cause, processes=processes, chunk_size=chunk_size, ordered=False)) == freeze(actual_causes)
+
+    sufficient_causes = list(search_candidate_causes(fact, causal_setting, is_sufficient_cause))
+    assert freeze(sufficient_causes) == freeze([{'AS': False, 'ES_M': True}, {'FF_M': True}])
+    parallel_setting = CausalSetting(weather_network(), context, exogenous_domains, endogenous_domains)
+    assert list(search_candidate_causes(fact, parallel_setting, is_sufficient_cause, processes=processes, chunk_size=chunk_size)) == sufficient_causes
+    parallel_setting = CausalSetting(weather_network(), context, exogenous_domains, endogenous_domains)
+    assert freeze(search_candidate_causes(fact, parallel_setting, is_sufficient_cause, processes=processes, chunk_size=chunk_size, ordered=False)) == freeze(sufficient_causes)
+
+    contexts = [dict(zip(exogenous_domains, values)) for values in itertools.product([False, True], repeat=len(exogenous_domains))]
+    explanandum = Disjunction(fact, foil)
+    epistemic_state = EpistemicState(causal_network, contexts, exogenous_domains, endogenous_domains)
+    explanations = list(search_candidate_explanations(explanandum, epistemic_state, is_explanation))
+    assert freeze(explanations) == freeze([{'AS': False, 'ES_M': True}, {'AS': False, 'ES_J': True}, {'AS': True, 'ES_J': True}, {'ES_J': True, 'ES_M': False}, {'ES_J': True, 'ES_M': True}, {'FF_M': True}, {'FF_J': True}])
+    parallel_epistemic_state = EpistemicState(weather_network(), contexts, exogenous_domains, endogenous_domains, processes=processes)  # finds the actual causes of its settings in parallel
+    assert list(search_candidate_explanations(explanandum, parallel_epistemic_state, is_explanation)) == explanations
+    parallel_epistemic_state = EpistemicState(weather_network(), contexts, exogenous_domains, endogenous_domains)
+    assert list(search_candidate_explanations(explanandum, parallel_epistemic_state, is_explanation, processes=processes, chunk_size=chunk_size)) == explanations
+
+    contrastive_causes = list(find_contrastive_counterfactual_causes((fact, foil), causal_setting))
+    assert contrastive_causes == [({'AS': False}, {'AS': True}), ({'ES_M': True}, {'ES_M': False}), ({'FF_M': True}, {'FF_M': False})]
+    parallel_setting = CausalSetting(weather_network(), context, exogenous_domains, endogenous_domains)
+    assert list(find_contrastive_counterfactual_causes((fact, foil), parallel_setting, processes=processes, chunk_size=chunk_size)) == contrastive_causes
@@ -0,0 +1,112 @@
+import itertools
+import weakref
+
+from causal_explainer import instrumentation
+from causal_explainer.halpern_pearl.causes import PrimitiveEvent, Negation, Conjunction, Disjunction, find_witness_variables_ac2
+from causal_explainer.sat import CNF, solve
+
+# CNF encodings of counterfactual queries over Boolean causal networks, where the SAT variable of a network variable is its slot plus one;
+# counterfactuals replace any bindings of the network, so only the structural equations of the base network are encoded
+
+equation_clauses_cache = weakref.WeakKeyDictionary()  # clauses of the structural equations of each compiled network
+
+
+def is_boolean(causal_setting):
+    return all(domain == {False, True} for domain in itertools.chain(causal_setting.exogenous_domains.values(), causal_setting.endogenous_domains.values()))
+
+
+def literal(compiled, variable, value):
+    return compiled.slots[variable] + 1 if value else -(compiled.slots[variable] + 1)
+
+
+def find_equation_clauses(compiled):  # one clause per combination of parent values, so each equation is called 2^k times for k parents
+    if compiled not in equation_clauses_cache:
+        equation_clauses = dict()
+        for slot, variable, structural_equation, parents in compiled.plan:
+            equation_clauses[variable] = [
+                [literal(compiled, parent_variable, not value) for (parent_variable, _), value in zip(parents, parent_values_tuple)]
+                + [literal(compiled, variable, structural_equation({parent_variable: value for (parent_variable, _), value in zip(parents, parent_values_tuple)}))]
+                for parent_values_tuple in itertools.product([False, True], repeat=len(parents))
+            ]
+        equation_clauses_cache[compiled] = equation_clauses
+    return equation_clauses_cache[compiled]
+
+
+def encode_event(cnf, compiled, event):  # Tseitin encoding, returns a literal that holds iff event holds
+    if isinstance(event, PrimitiveEvent):
+        if event.value in (False, True):
+            return literal(compiled, event.variable, event.value)
+        never = cnf.new_variable()  # value outside the Boolean domain
+        cnf.add_clause([-never])
+        return never
+    if isinstance(event, Negation):
+        return -encode_event(cnf, compiled, event.child)
+    left = encode_event(cnf, compiled, event.left_child)
+    right = encode_event(cnf, compiled, event.right_child)
+    output = cnf.new_variable()
+    if isinstance(event, Conjunction):
+        cnf.add_clause([-output, left])
+        cnf.add_clause([-output, right])
+        cnf.add_clause([output, -left, -right])
+    elif isinstance(event, Disjunction):
+        cnf.add_clause([-output, left, right])
+        cnf.add_clause([output, -left])
+        cnf.add_clause([output, -right])
+    else:
+        raise NotImplementedError(type(event))
+    return output
+
+
+def encode_counterfactual(compiled, context, intervention, event, selectors=None):
+    # [intervention]!event, in context if given and otherwise in any context;
+    # selectors maps variables to pairs (selector, value) where a true selector fixes the variable to value instead of its equation
+    cnf = CNF()
+    cnf.num_variables = len(compiled.variables)
+    if context is not None:
+        for variable, _ in compiled.exogenous_slots:
+            cnf.add_clause([literal(compiled, variable, context[variable])])
+    equation_clauses = find_equation_clauses(compiled)
+    selectors = selectors if selectors is not None else dict()
+    for _, variable, _, _ in compiled.plan:
+        if variable in intervention:
+            cnf.add_clause([literal(compiled, variable, intervention[variable])])
+        elif variable in selectors:
+            selector, value = selectors[variable]
+            cnf.add_clause([-selector, literal(compiled, variable, value)])
+            cnf.clauses.extend(clause + [selector] for clause in equation_clauses[variable])
+        else:
+            cnf.clauses.extend(equation_clauses[variable])
+    cnf.num_variables += len(selectors)  # selectors are numbered after the network variables
+    cnf.add_clause([-encode_event(cnf, compiled, event)])
+    return cnf
+
+
+def find_witness_ac2(candidate, event, causal_setting, max_size=None, smallest=True):  # as find_smallest_witness_ac2, smallest=False returns any witness
+    x_prime = {variable: not causal_setting.values[variable] for variable in candidate}
+    if max_size is not None and max_size < len(x_prime):
+        return None
+    compiled = causal_setting.causal_network.compile()
+    on_paths_w, _ = find_witness_variables_ac2(candidate, event, causal_setting)
+    selectors = {variable: (len(compiled.variables) + position + 1, value) for position, (variable, value) in enumerate(sorted(on_paths_w.items()))}
+    cnf = encode_counterfactual(compiled, causal_setting.context, x_prime, event, selectors)
+    w_size = len(selectors) if max_size is None else max_size - len(x_prime)
+    model = None
+    while True:  # tighten the bound on the size of w until no witness remains
+        bounded_cnf = cnf.copy()
+        bounded_cnf.add_at_most([selector for selector, _ in selectors.values()], w_size)
+        instrumentation.count("sat_solves")
+        bounded_model = solve(bounded_cnf)
+        if bounded_model is None:
+            break
+        model = bounded_model
+        w_size = sum(model[selector] for selector, _ in selectors.values()) - 1
+        if not smallest or w_size < 0:
+            break
+    if model is None:
+        return None
+    return {**x_prime, **{variable: value for variable, (selector, value) in selectors.items() if model[selector]}}
+
+
+def satisfies_sc3(candidate, event, causal_setting):  # [candidate]event holds in every context iff [candidate]!event is unsatisfiable
+    instrumentation.count("sat_solves")
+    return solve(encode_counterfactual(causal_setting.causal_network.compile(), None, candidate, event)) is None
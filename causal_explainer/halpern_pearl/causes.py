@@ -1,16 +1,16 @@
+import functools
 import itertools
-import logging
+import operator
 from abc import ABC, abstractmethod, ABCMeta
+from collections import deque
 from copy import copy
 
-from networkx import DiGraph, topological_sort
-from networkx.drawing.nx_agraph import to_agraph
-
-from causal_explainer.utils import powerset, format_dict, powerdict
-
-
-logger = logging.getLogger("halpern_pearl")
-logging.basicConfig(level=logging.INFO)
+from causal_explainer import instrumentation
+from causal_explainer.halpern_pearl import vectorized
+from causal_explainer.halpern_pearl.tabular import TabularEquation
+from causal_explainer.parallel import run_chunks, chunked, create_executor
+from causal_explainer.instrumentation import clause
+from causal_explainer.utils import powerset, format_dict, LRUCache, AssignmentCodec, submasks, submasks_by_size
 
 
 class Variable:
@@ -33,15 +33,28 @@ class Variable:
         return self.symbol < other.symbol
 
 
-class Event(ABC):
-    @abstractmethod
+class Event(ABC):  # events are immutable, and equal (with equal hashes) if they have the same structure
     def entailed_by(self, causal_setting):
-        raise NotImplemented
+        return causal_setting.causal_network.compile().evaluator(self)(causal_setting.world)
+
+    @abstractmethod
+    def holds_columns(self, columns):  # columns maps (at least) the variables of this event to NumPy arrays of values, one row per world
+        raise NotImplementedError
 
     @abstractmethod
     def variables(self):
         raise NotImplemented
 
+    @abstractmethod
+    def compile(self, slots):  # function of a sequence of values, where slots maps (at least) the variables of this event to their positions
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return isinstance(other, Event) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
     def __repr__(self):
         return self.__str__()
 
@@ -50,13 +63,18 @@ class PrimitiveEvent(Event):
     def __init__(self, variable, value):
         self.variable = variable
         self.value = value
+        self.key = "=", variable, value  # structural form, as nested tuples
 
-    def entailed_by(self, causal_setting):
-        return causal_setting.values[self.variable] == self.value
+    def holds_columns(self, columns):
+        return vectorized.equals(columns[self.variable], self.value)
 
     def variables(self):
         return {self.variable}
 
+    def compile(self, slots):
+        slot, value = slots[self.variable], self.value
+        return lambda values: values[slot] == value
+
     def __str__(self):
         return f"{self.variable}={self.value}"
 
@@ -64,37 +82,69 @@ class PrimitiveEvent(Event):
 class Negation(Event):
     def __init__(self, child):
         self.child = child
+        self.key = "!", child.key
 
-    def entailed_by(self, causal_setting):
-        return not self.child.entailed_by(causal_setting)
+    def holds_columns(self, columns):
+        return ~self.child.holds_columns(columns)
 
     def variables(self):
         return self.child.variables()
 
+    def compile(self, slots):
+        holds = self.child.compile(slots)
+        return lambda values: not holds(values)
+
     def __str__(self):
         return f"!({self.child})"
 
 
 class BinaryFormula(Event, metaclass=ABCMeta):
+    symbol = None
+
     def __init__(self, left_child, right_child):
         self.left_child = left_child
         self.right_child = right_child
+        self.key = self.symbol, left_child.key, right_child.key
 
     def variables(self):
         return self.left_child.variables() | self.right_child.variables()
 
+    def operands(self):  # flattens nested formulas of the same kind, e.g. the conjuncts of a conjunction
+        for child in (self.left_child, self.right_child):
+            if type(child) is type(self):
+                yield from child.operands()
+            else:
+                yield child
+
 
 class Conjunction(BinaryFormula):
-    def entailed_by(self, causal_setting):
-        return self.left_child.entailed_by(causal_setting) and self.right_child.entailed_by(causal_setting)
+    symbol = "&"
+
+    def compile(self, slots):
+        operands = list(self.operands())
+        if all(isinstance(operand, PrimitiveEvent) for operand in operands):  # compares all conjuncts in one go
+            getter = operator.itemgetter(*(slots[operand.variable] for operand in operands))
+            expected = tuple(operand.value for operand in operands)
+            return lambda values: getter(values) == expected
+        evaluators = [operand.compile(slots) for operand in operands]
+        return lambda values: all(holds(values) for holds in evaluators)
+
+    def holds_columns(self, columns):
+        return self.left_child.holds_columns(columns) & self.right_child.holds_columns(columns)
 
     def __str__(self):
         return f"({self.left_child} & {self.right_child})"
 
 
 class Disjunction(BinaryFormula):
-    def entailed_by(self, causal_setting):
-        return self.left_child.entailed_by(causal_setting) or self.right_child.entailed_by(causal_setting)
+    symbol = "|"
+
+    def compile(self, slots):
+        evaluators = [operand.compile(slots) for operand in self.operands()]
+        return lambda values: any(holds(values) for holds in evaluators)
+
+    def holds_columns(self, columns):
+        return self.left_child.holds_columns(columns) | self.right_child.holds_columns(columns)
 
     def __str__(self):
         return f"({self.left_child} | {self.right_child})"
@@ -109,61 +159,271 @@ def assignments2conjunction(assignments, right_child=None):
     return assignments2conjunction(assignments_remainder, formula) if assignments_remainder else formula
 
 
+def satisfies_assignments(assignments, causal_setting):  # as assignments2conjunction(assignments).entailed_by(causal_setting), without building the formula
+    values = causal_setting.values
+    return all(values[variable] == value for variable, value in assignments.items())
+
+
+def topological_order(parents):  # Kahn's algorithm over a dictionary mapping variables to their parents, taking variables in the order given when free to choose
+    children = {variable: [] for variable in parents}
+    in_degrees = {variable: len(variable_parents) for variable, variable_parents in parents.items()}
+    for variable, variable_parents in parents.items():
+        for parent_variable in variable_parents:
+            children[parent_variable].append(variable)
+    ready = deque(variable for variable in parents if in_degrees[variable] == 0)
+    order = []
+    while ready:
+        variable = ready.popleft()
+        order.append(variable)
+        for child_variable in children[variable]:
+            in_degrees[child_variable] -= 1
+            if in_degrees[child_variable] == 0:
+                ready.append(child_variable)
+    assert len(order) == len(parents)  # otherwise the network has a cycle
+    return order
+
+
+class CompiledCausalNetwork:  # flat evaluation plan over integer slots, with slots assigned in topological order
+    def __init__(self, causal_network):
+        self.variables = topological_order(causal_network.parents)
+        self.slots = {variable: slot for slot, variable in enumerate(self.variables)}
+
+        self.exogenous_slots = [(variable, self.slots[variable]) for variable in self.variables if not causal_network.parents[variable]]
+        self.plan = [
+            (self.slots[variable], variable, causal_network.structural_equations[variable], [(parent_variable, self.slots[parent_variable]) for parent_variable in causal_network.parents[variable]])
+            for variable in self.variables if causal_network.parents[variable]
+        ]
+        # exogenous variables that a counterfactual can depend on beyond the actual values of the endogenous variables
+        exogenous_variables = {variable for variable, _ in self.exogenous_slots}
+        self.counterfactual_exogenous_slots = sorted({
+            parent_slot for _, _, _, parents in self.plan if any(parent_variable not in exogenous_variables for parent_variable, _ in parents)
+            for parent_variable, parent_slot in parents if parent_variable in exogenous_variables
+        })
+
+        self.array_equations = dict(causal_network.array_equations)
+        self.vectorizable = all(variable in self.array_equations or isinstance(structural_equation, TabularEquation) for _, variable, structural_equation, _ in self.plan)
+        self.evaluators = [None] * len(self.variables)  # functions of the value array computing each endogenous variable indexed by slot, None for exogenous variables
+        for slot, _, structural_equation, parents in self.plan:
+            if isinstance(structural_equation, TabularEquation):
+                self.evaluators[slot] = structural_equation.evaluator(self.slots)
+            else:
+                self.evaluators[slot] = lambda values, structural_equation=structural_equation, parents=parents: structural_equation({parent_variable: values[parent_slot] for parent_variable, parent_slot in parents})
+
+        self.event_evaluators = LRUCache(2 ** 12)  # compiled events, see evaluator
+
+        # bitmasks over slots, where bit i stands for self.variables[i]
+        self.endogenous_mask = sum(1 << slot for slot, _, _, _ in self.plan)
+        self.ancestors = [1 << slot for slot in range(len(self.variables))]  # reflexive
+        for slot, _, _, parents in self.plan:
+            for _, parent_slot in parents:
+                self.ancestors[slot] |= self.ancestors[parent_slot]
+        self.descendants = [1 << slot for slot in range(len(self.variables))]  # reflexive
+        for slot, _, _, parents in reversed(self.plan):
+            for _, parent_slot in parents:
+                self.descendants[parent_slot] |= self.descendants[slot]
+
+    def evaluate(self, context, bindings):
+        values = [None] * len(self.variables)
+        for variable, slot in self.exogenous_slots:
+            values[slot] = context[variable]
+        for slot, variable, _, _ in self.plan:
+            values[slot] = bindings[variable] if variable in bindings else self.evaluators[slot](values)
+        return values
+
+    def reevaluate(self, values, previous_bindings, bindings, variables=None):
+        # values were evaluated under previous_bindings, so only descendants of variables bound by either set can change;
+        # if variables is given then only the ancestors of those variables are brought up to date, the rest are left stale
+        cone = 0
+        for variable in itertools.chain(previous_bindings, bindings):
+            cone |= self.descendants[self.slots[variable]]
+        if variables is not None:
+            cone &= self.mask(variables, self.ancestors)
+        cone &= self.endogenous_mask
+        values = list(values)
+        while cone:
+            lowest = cone & -cone  # slots are in topological order, so visiting bits from the lowest up respects dependencies
+            cone ^= lowest
+            slot = lowest.bit_length() - 1
+            variable = self.variables[slot]
+            values[slot] = bindings[variable] if variable in bindings else self.evaluators[slot](values)
+        return values
+
+    def evaluator(self, event):  # event compiled over value arrays indexed by slot
+        key = event, None
+        evaluator = self.event_evaluators.get(key)
+        if evaluator is None:
+            evaluator = event.compile(self.slots)
+            self.event_evaluators.put(key, evaluator)
+        return evaluator
+
+    def restricted_evaluator(self, event):  # pair of the slots of the variables of event, in order, and event compiled over tuples of the values at those slots
+        key = event, "restricted"
+        restricted_evaluator = self.event_evaluators.get(key)
+        if restricted_evaluator is None:
+            slots = tuple(sorted(self.slots[variable] for variable in event.variables()))
+            restricted_evaluator = slots, event.compile({self.variables[slot]: position for position, slot in enumerate(slots)})
+            self.event_evaluators.put(key, restricted_evaluator)
+        return restricted_evaluator
+
+    def world_key(self, values, bindings):  # worlds with equal keys agree on the actual values and on every counterfactual
+        if bindings:  # counterfactuals replace bindings, so recomputed bound variables can depend on any exogenous variable
+            return tuple(values)
+        return tuple(values[slot] for slot, _, _, _ in self.plan) + tuple(values[slot] for slot in self.counterfactual_exogenous_slots)
+
+    def context_key(self, context):  # canonical form of a context, as a tuple of values ordered by slot
+        return tuple(context[variable] for variable, _ in self.exogenous_slots)
+
+    def mask(self, variables, closures):
+        mask = 0
+        for variable in variables:
+            mask |= closures[self.slots[variable]]
+        return mask
+
+    def endogenous_values(self, values):
+        return {variable: values[slot] for slot, variable, _, _ in self.plan}
+
+
 class CausalNetwork:
-    def __init__(self):
-        self.graph = DiGraph()
+    def __init__(self, counterfactual_cache_size=2 ** 16, sat_solver=False, setting_cache_size=2 ** 10):
+        # counterfactual_cache_size=None for unbounded, counterfactual_cache_size=0 to disable, and likewise for setting_cache_size
+        # sat_solver=True decides AC2 and SC3 by satisfiability (see boolean.py) in settings where every domain is {False, True}
+        self.parents = dict()  # maps each variable to a dictionary whose keys are its parents in the order added, exogenous variables having none
+        self.sat_solver = sat_solver
 
         self.structural_equations = dict()
+        self.array_equations = dict()
         self.endogenous_bindings = dict()
 
-    def add_dependency(self, endogenous_variable, parents, structural_equation):
+        self.compiled = None
+        self.counterfactual_cache = LRUCache(counterfactual_cache_size)  # shared by all settings and intervened views of this network
+        self.settings = LRUCache(setting_cache_size)  # settings of each context reused across queries (see contrastive_causes.bifactual_setting), cleared along with compiled
+        self.context_tables = dict()  # every context over given exogenous domains as columns (see vectorized.ContextTable), shared by all settings and intervened views
+
+    def add_dependency(self, endogenous_variable, parents, structural_equation, array_equation=None):
+        # structural_equation is a function of a dictionary mapping parent variables to values, or a TabularEquation over parents
+        # array_equation optionally computes the same function over a dictionary mapping parent variables to NumPy arrays, for batched evaluation
         for parent_variable in parents:
-            self.graph.add_edge(parent_variable, endogenous_variable)
+            self.parents.setdefault(parent_variable, dict())
+            self.parents.setdefault(endogenous_variable, dict())[parent_variable] = None
         self.structural_equations[endogenous_variable] = structural_equation
+        if array_equation is None:
+            self.array_equations.pop(endogenous_variable, None)
+        else:
+            self.array_equations[endogenous_variable] = array_equation
+        self.compiled = None  # structure changed so any existing evaluation plan is stale
+        self.counterfactual_cache.clear()
+        self.settings.clear()
+        self.context_tables.clear()
+
+    def tabulate(self, domains):  # replaces every structural equation by a table over the finite domains of its parents, given by domains
+        for endogenous_variable, structural_equation in self.structural_equations.items():
+            if not isinstance(structural_equation, TabularEquation):
+                self.structural_equations[endogenous_variable] = TabularEquation.tabulate(structural_equation, list(self.parents[endogenous_variable]), domains)
+        self.compiled = None  # same functions, so cached counterfactuals remain valid
+        self.settings.clear()
+
+    def compile(self):
+        if self.compiled is None:
+            self.compiled = CompiledCausalNetwork(self)
+        return self.compiled
 
     def evaluate(self, context):
-        values = copy(context)
-        for variable in topological_sort(self.graph):
-            if variable not in values:
-                values[variable] = self.structural_equation(variable, values)
-        return {key: value for key, value in values.items() if key not in context}
+        compiled = self.compile()
+        return compiled.endogenous_values(compiled.evaluate(context, self.endogenous_bindings))
+
+    @property
+    def graph(self):  # as a networkx DiGraph, which is only imported on demand
+        from networkx import DiGraph
+        graph = DiGraph()
+        graph.add_nodes_from(self.parents)
+        graph.add_edges_from((parent_variable, variable) for variable, variable_parents in self.parents.items() for parent_variable in variable_parents)
+        return graph
 
     def signature(self):
-        in_degrees = self.graph.in_degree()
-        return {v for v, d in in_degrees if d == 0}, {v for v, d in in_degrees if d != 0}
+        return {v for v, p in self.parents.items() if not p}, {v for v, p in self.parents.items() if p}
 
     def structural_equation(self, variable, parent_values):
         return self.endogenous_bindings[variable] if variable in self.endogenous_bindings else self.structural_equations[variable](parent_values)
 
     def intervene(self, intervention):
-        new_causal_network = CausalNetwork()
-        _, endogenous_variables = self.signature()
-        for variable in endogenous_variables:
-            new_causal_network.add_dependency(variable, self.graph.predecessors(variable), self.structural_equations[variable])
-        for variable, value in intervention.items():
-            new_causal_network.endogenous_bindings[variable] = value
-        return new_causal_network
-
-    def write(self, path, prog="dot"):  # prog=neato|dot|twopi|circo|fdp|nop
+        return IntervenedCausalNetwork(self, intervention)
+
+    def write(self, path, prog="dot"):  # prog=neato|dot|twopi|circo|fdp|nop, requires networkx and pygraphviz
+        from networkx.drawing.nx_agraph import to_agraph
         to_agraph(self.graph).draw(path, prog=prog)
 
 
+class IntervenedCausalNetwork:  # view sharing the structure and equations of a base network, recording only the bindings
+    def __init__(self, causal_network, intervention):
+        self.base = causal_network
+        self.parents = causal_network.parents
+        self.structural_equations = causal_network.structural_equations
+        self.array_equations = causal_network.array_equations
+        self.endogenous_bindings = dict(intervention)
+        self.counterfactual_cache = causal_network.counterfactual_cache
+        self.context_tables = causal_network.context_tables
+        self.settings = LRUCache(causal_network.settings.maxsize)  # not shared, as the bindings differ from those of the base network
+        self.sat_solver = causal_network.sat_solver
+
+    @property
+    def graph(self):
+        return self.base.graph
+
+    def compile(self):
+        return self.base.compile()
+
+    def evaluate(self, context):
+        compiled = self.compile()
+        return compiled.endogenous_values(compiled.evaluate(context, self.endogenous_bindings))
+
+    def signature(self):
+        return self.base.signature()
+
+    def structural_equation(self, variable, parent_values):
+        return self.endogenous_bindings[variable] if variable in self.endogenous_bindings else self.structural_equations[variable](parent_values)
+
+    def intervene(self, intervention):  # as for CausalNetwork, a new intervention replaces rather than extends existing bindings
+        return IntervenedCausalNetwork(self.base, intervention)
+
+    def write(self, path, prog="dot"):
+        self.base.write(path, prog=prog)
+
+
 class CausalSetting:
-    def __init__(self, causal_network, context, exogenous_domains, endogenous_domains):
+    def __init__(self, causal_network, context, exogenous_domains, endogenous_domains, validate=True, baseline=None):  # validate=False skips the domain checks, e.g. for settings derived from an already validated one
         self.causal_network = causal_network
         self.context = context  # dict mapping exogenous variables to values
         self.exogenous_domains = exogenous_domains
         self.endogenous_domains = endogenous_domains
 
-        exogenous_variables, endogenous_variables = self.causal_network.signature()
-        assert exogenous_variables == set(self.context.keys())
-        assert exogenous_variables == set(self.exogenous_domains.keys())
-        assert endogenous_variables == set(self.endogenous_domains.keys())
-
-        assert all(self.context[exogenous_variable] in domain for exogenous_variable, domain in self.exogenous_domains.items())
-        self.derived_values = self.causal_network.evaluate(self.context)
+        if validate:
+            exogenous_variables, endogenous_variables = self.causal_network.signature()
+            assert exogenous_variables == set(self.context.keys())
+            assert exogenous_variables == set(self.exogenous_domains.keys())
+            assert endogenous_variables == set(self.endogenous_domains.keys())
+            assert all(self.context[exogenous_variable] in domain for exogenous_variable, domain in self.exogenous_domains.items())
+
+        compiled = self.causal_network.compile()
+        if baseline is None:
+            self.world = compiled.evaluate(self.context, self.causal_network.endogenous_bindings)  # values indexed by slot
+        else:  # baseline is a setting with the same context over the same base network, so only the affected variables need re-evaluating
+            self.world = compiled.reevaluate(baseline.world, baseline.causal_network.endogenous_bindings, self.causal_network.endogenous_bindings)
+        self.derived_values = compiled.endogenous_values(self.world)
+        self.context_key = compiled.context_key(self.context)
+        self.memo = dict()  # results derived from this setting, such as indexes of its causes, keyed by kind and event
+        self.assignment_codec = None if baseline is None else baseline.codec()  # settings derived by intervention share the domains
         self.values = {**self.context, **self.derived_values}
-        assert all(self.values[endogenous_variable] in domain for endogenous_variable, domain in self.endogenous_domains.items())
+
+        if validate:
+            assert all(self.values[endogenous_variable] in domain for endogenous_variable, domain in self.endogenous_domains.items())
+
+    def intervene(self, intervention):
+        return CausalSetting(self.causal_network.intervene(intervention), self.context, self.exogenous_domains, self.endogenous_domains, validate=False, baseline=self)
+
+    def codec(self):  # encoding of assignments to endogenous variables, see AssignmentCodec
+        if self.assignment_codec is None:
+            self.assignment_codec = AssignmentCodec(self.endogenous_domains)
+        return self.assignment_codec
 
 
 class CausalFormula:
@@ -171,44 +431,116 @@ class CausalFormula:
         self.intervention = intervention  # dict mapping endogenous variables to values
         self.event = event  # Boolean combination of primitive events
 
-    def entailed_by(self, causal_setting):
-        new_causal_network = causal_setting.causal_network.intervene(self.intervention)
-        new_causal_setting = CausalSetting(new_causal_network, causal_setting.context, causal_setting.exogenous_domains, causal_setting.endogenous_domains)
-        return self.event.entailed_by(new_causal_setting)
+    def entailed_by(self, causal_setting):  # only the variables of the event are brought up to date, starting from the values of causal_setting
+        causal_network = causal_setting.causal_network
+        compiled = causal_network.compile()
+        slots, holds = compiled.restricted_evaluator(self.event)
+        key = causal_setting.context_key, frozenset(self.intervention.items()), slots  # independent of any bindings in causal_network, which the intervention replaces
+        values = causal_network.counterfactual_cache.get(key)
+        stats = instrumentation.active
+        if stats is not None:
+            stats.count("counterfactuals")
+            stats.count("cache_hits" if values is not None else "cache_misses")
+        if values is None:
+            world = compiled.reevaluate(causal_setting.world, causal_network.endogenous_bindings, self.intervention, self.event.variables())
+            values = tuple(world[slot] for slot in slots)
+            causal_network.counterfactual_cache.put(key, values)
+        return holds(values)
 
     def __str__(self):
         return f"[{format_dict(self.intervention, sep_item='; ', sep_key_value='<-', brackets=False)}]({self.event})"
 
 
+@clause("AC1")
 def satisfies_ac1(candidate, event, causal_setting):
     if not candidate:
         return False
-    if not assignments2conjunction(candidate).entailed_by(causal_setting):
+    if not satisfies_assignments(candidate, causal_setting):
         return False
     if not event.entailed_by(causal_setting):
         return False
     return True
 
 
-def find_witnesses_ac2(candidate, event, causal_setting):
-    x = {candidate_variable: causal_setting.values[candidate_variable] for candidate_variable in candidate}
-    all_w = {other_variable: causal_setting.values[other_variable] for other_variable in causal_setting.endogenous_domains.keys() - candidate.keys()}
+def find_witness_variables_ac2(candidate, event, causal_setting):  # splits the variables outside candidate into those worth fixing in a witness and the rest, with their actual values
+    # fixing a variable to its actual value only matters if it is both downstream of a changed variable and upstream of the event,
+    # where the counterfactual changes candidate and drops any bindings of the network of causal_setting
+    causal_network = causal_setting.causal_network
+    compiled = causal_network.compile()
+    on_paths = compiled.mask(itertools.chain(candidate, causal_network.endogenous_bindings), compiled.descendants) & compiled.mask(event.variables(), compiled.ancestors)
+    on_paths_w, off_paths_w = dict(), dict()
+    for other_variable in causal_setting.endogenous_domains.keys() - candidate.keys():
+        (on_paths_w if on_paths >> compiled.slots[other_variable] & 1 else off_paths_w)[other_variable] = causal_setting.values[other_variable]
+    return on_paths_w, off_paths_w
 
-    x_variables_tuple = sorted(x.keys())
-    x_domains_tuple = [causal_setting.endogenous_domains[variable] - {x[variable]} for variable in x_variables_tuple]  # only consider "remaining" values in domain
 
-    for x_prime_values_tuple in itertools.product(*x_domains_tuple):
-        x_prime = {variable: value for variable, value in zip(x_variables_tuple, x_prime_values_tuple)}
-        for w in powerdict(all_w):
-            witness = {**x_prime, **w}
-            casual_formula = CausalFormula(witness, Negation(event))
-            if casual_formula.entailed_by(causal_setting):
-                yield witness
+def uses_sat_solver(causal_setting):
+    if not causal_setting.causal_network.sat_solver:
+        return False
+    from causal_explainer.halpern_pearl import boolean  # imported here as it depends on this module
+    if "boolean" not in causal_setting.memo:
+        causal_setting.memo["boolean"] = boolean.is_boolean(causal_setting)
+    return causal_setting.memo["boolean"]
 
 
+def find_witnesses_ac2(candidate, event, causal_setting, exhaustive=False, max_size=None, batch_size=1024):
+    # witnesses are yielded in nondecreasing order of size, omitting any larger than max_size
+    # exhaustive=True also yields witnesses extended by variables off the paths from candidate to event (breaking the order, but not the bound)
+    # if every equation has an array form then batch_size potential witnesses at a time are checked in one vectorized sweep
+    x = {candidate_variable: causal_setting.values[candidate_variable] for candidate_variable in candidate}
+    if max_size is not None and max_size < len(x):
+        return
+
+    causal_network = causal_setting.causal_network
+    compiled = causal_network.compile()
+    on_paths_w, off_paths_w = find_witness_variables_ac2(candidate, event, causal_setting)
+
+    # potential witnesses are built as codes and decoded once each, rather than merging dictionaries of x' and w
+    codec = causal_setting.codec()
+    x_mask, _ = codec.encode(x)
+    x_variables_tuple = sorted(x.keys())
+    x_domains_tuple = [causal_setting.endogenous_domains[variable] - {x[variable]} for variable in x_variables_tuple]  # only consider "remaining" values in domain
+    x_prime_codes = [codec.encode(dict(zip(x_variables_tuple, x_prime_values_tuple)))[1] for x_prime_values_tuple in itertools.product(*x_domains_tuple)]
+    on_paths_mask, on_paths_code = codec.encode(on_paths_w)
+
+    potential_witnesses = (
+        codec.decode(x_mask | w_mask, x_prime_code | codec.restrict(on_paths_code, w_mask))
+        for w_mask in submasks_by_size(on_paths_mask, None if max_size is None else max_size - len(x)) for x_prime_code in x_prime_codes
+    )
+    if instrumentation.active is not None:
+        potential_witnesses = instrumentation.counted("witnesses", potential_witnesses)
+    if compiled.vectorizable and vectorized.available():
+        witnesses = vectorized.filter_interventions(Negation(event), causal_network, causal_setting.context, potential_witnesses, batch_size)
+    else:
+        witnesses = (witness for witness in potential_witnesses if CausalFormula(witness, Negation(event)).entailed_by(causal_setting))
+    off_paths_mask, off_paths_code = codec.encode(off_paths_w)
+    for witness in witnesses:
+        if exhaustive:
+            witness_mask, witness_code = codec.encode(witness)
+            yield witness
+            for w_mask in submasks_by_size(off_paths_mask, None if max_size is None else max_size - len(witness)):
+                if w_mask:  # the empty extension is witness itself
+                    yield codec.decode(witness_mask | w_mask, witness_code | codec.restrict(off_paths_code, w_mask))
+        else:
+            yield witness
+
+
+def find_smallest_witness_ac2(candidate, event, causal_setting, bound=None):  # bound=k only looks for witnesses smaller than k
+    if uses_sat_solver(causal_setting):
+        from causal_explainer.halpern_pearl import boolean
+        return boolean.find_witness_ac2(candidate, event, causal_setting, max_size=None if bound is None else bound - 1)
+    for witness in find_witnesses_ac2(candidate, event, causal_setting, max_size=None if bound is None else bound - 1):
+        return witness
+    return None
+
+
+@clause("AC2")
 def satisfies_ac2(candidate, event, causal_setting):
     if not candidate:
         return False
+    if uses_sat_solver(causal_setting):
+        from causal_explainer.halpern_pearl import boolean
+        return boolean.find_witness_ac2(candidate, event, causal_setting, smallest=False) is not None
     for _ in find_witnesses_ac2(candidate, event, causal_setting):
         return True  # there is at least one witness
     return False
@@ -216,55 +548,98 @@ def satisfies_ac2(candidate, event, causal_setting):
 
 def is_weak_actual_cause(candidate, event, causal_setting):  # non-minimal actual cause
     if not satisfies_ac1(candidate, event, causal_setting):
-        logger.debug("AC1 failed")
         return False
-    logger.debug("AC1 passed")
     if not satisfies_ac2(candidate, event, causal_setting):
-        logger.debug("AC2 failed")
         return False
-    logger.debug("AC2 passed")
     return True
 
 
-def satisfies_ac3(candidate, event, causal_setting):
-    for subset_candidate in powerdict(candidate):
-        if subset_candidate != candidate:
-            if is_weak_actual_cause(subset_candidate, event, causal_setting):
-                return False
-    return True
+def is_weak_subset(candidate, event, causal_setting, kind, condition):
+    # whether some non-empty proper subset of candidate satisfies condition, with results memoized per encoded subset for the checks of other candidates
+    results = causal_setting.memo.setdefault((kind, event), dict())
+    codec = causal_setting.codec()
+    mask, code = codec.encode(candidate)
+    for subset_mask in submasks(mask):
+        if subset_mask != mask:
+            key = subset_mask, codec.restrict(code, subset_mask)
+            if key in results:
+                instrumentation.count("memo_hits")
+            else:
+                results[key] = condition(codec.decode(*key), event, causal_setting)
+            if results[key]:
+                return True
+    return False
+
+
+@clause("AC3")
+def satisfies_ac3(candidate, event, causal_setting):  # the empty subset is never a weak cause, by AC1
+    return not is_weak_subset(candidate, event, causal_setting, "weak_actual_causes", is_weak_actual_cause)
 
 
 def is_actual_cause(candidate, event, causal_setting):  # as in Halpern (2015) rather than Halpern & Pearl (2005)
     if not is_weak_actual_cause(candidate, event, causal_setting):
         return False
     if not satisfies_ac3(candidate, event, causal_setting):
-        logger.debug("AC3 failed")
         return False
-    logger.debug("AC3 passed")
     return True
 
 
+@clause("SC1")
 def satisfies_sc1(candidate, event, causal_setting):
-    if not assignments2conjunction(candidate).entailed_by(causal_setting):
+    if not satisfies_assignments(candidate, causal_setting):
         return False
     if not event.entailed_by(causal_setting):
         return False
     return True
 
 
+def find_actual_cause_index(event, causal_setting):  # maps each conjunct (variable, value) to the actual causes it is part of, built once per event
+    key = "actual_cause_index", event
+    if key in causal_setting.memo:
+        instrumentation.count("memo_hits")
+    else:
+        actual_cause_index = dict()
+        for actual_cause in search_candidate_causes(event, causal_setting, is_actual_cause):
+            for variable, value in actual_cause.items():
+                actual_cause_index.setdefault((variable, value), []).append(actual_cause)
+        causal_setting.memo[key] = actual_cause_index
+    return causal_setting.memo[key]
+
+
+@clause("SC2")
 def satisfies_sc2(candidate, event, causal_setting):
-    for actual_cause in search_candidate_causes(event, causal_setting, is_actual_cause):
-        for variable, value in candidate.items():
-            if variable in actual_cause and actual_cause[variable] == value:  # conjunct variable=value of candidate is part of an actual cause
-                return True
-    return False
+    actual_cause_index = find_actual_cause_index(event, causal_setting)
+    return any((variable, value) in actual_cause_index for variable, value in candidate.items())  # some conjunct variable=value of candidate is part of an actual cause
 
 
+@clause("SC3")
 def satisfies_sc3(candidate, event, causal_setting):
-    for context_prime in find_exact_assignments(causal_setting.exogenous_domains, causal_setting.exogenous_domains.keys()):
-        if not CausalFormula(candidate, event).entailed_by(CausalSetting(causal_setting.causal_network, context_prime, causal_setting.exogenous_domains, causal_setting.endogenous_domains)):
-            return False
-    return True
+    results = causal_setting.memo.setdefault(("sc3", event), dict())  # shared by the subsets checked by SC4 and across candidates
+    key = causal_setting.codec().encode(candidate)
+    if key in results:
+        instrumentation.count("memo_hits")
+    else:
+        if uses_sat_solver(causal_setting):
+            from causal_explainer.halpern_pearl import boolean
+            results[key] = boolean.satisfies_sc3(candidate, event, causal_setting)
+        elif vectorized.available():  # evaluate the contexts a chunk at a time
+            results[key] = bool(vectorized.holds_in_all(event, causal_setting.causal_network, find_context_table(causal_setting), candidate))
+        else:
+            results[key] = all(
+                CausalFormula(candidate, event).entailed_by(CausalSetting(causal_setting.causal_network, context_prime, causal_setting.exogenous_domains, causal_setting.endogenous_domains, validate=False))
+                for context_prime in find_exact_assignments(causal_setting.exogenous_domains, causal_setting.exogenous_domains.keys())
+            )
+    return results[key]
+
+
+def find_context_table(causal_setting):  # every context over the exogenous domains of causal_setting, built once per network and domains
+    if "context_table" not in causal_setting.memo:
+        key = frozenset((exogenous_variable, frozenset(domain)) for exogenous_variable, domain in causal_setting.exogenous_domains.items())
+        context_tables = causal_setting.causal_network.context_tables
+        if key not in context_tables:
+            context_tables[key] = vectorized.ContextTable(causal_setting.exogenous_domains)
+        causal_setting.memo["context_table"] = context_tables[key]
+    return causal_setting.memo["context_table"]
 
 
 def is_weak_sufficient_cause(candidate, event, causal_setting):  # non-minimal sufficient cause
@@ -277,12 +652,9 @@ def is_weak_sufficient_cause(candidate, event, causal_setting):  # non-minimal s
     return True
 
 
+@clause("SC4")
 def satisfies_sc4(candidate, event, causal_setting):
-    for subset_candidate in powerdict(candidate):
-        if subset_candidate and subset_candidate != candidate:
-            if is_weak_sufficient_cause(subset_candidate, event, causal_setting):
-                return False
-    return True
+    return not is_weak_subset(candidate, event, causal_setting, "weak_sufficient_causes", is_weak_sufficient_cause)
 
 
 def is_sufficient_cause(candidate, event, causal_setting):  # as in Halpern (2016) rather than Halpern & Pearl (2005)
@@ -307,7 +679,89 @@ def find_all_assignments(domains):
             yield from find_exact_assignments(domains, variables)
 
 
-def search_candidate_causes(event, causal_setting, condition):
-    for candidate in find_all_assignments(causal_setting.endogenous_domains):
-        if condition(candidate, event, causal_setting):
-            yield candidate
+def find_consistent_exact_assignments(worlds, variables):  # assignments to exactly variables that agree with at least one of worlds, without duplicates
+    variables_tuple = sorted(variables)
+    found = set()
+    for values in worlds:
+        values_tuple = tuple(values[variable] for variable in variables_tuple)
+        if values_tuple not in found:
+            found.add(values_tuple)
+            yield {variable: value for variable, value in zip(variables_tuple, values_tuple)}
+
+
+consistent_conditions = {is_weak_actual_cause, is_actual_cause, is_weak_sufficient_cause, is_sufficient_cause}  # conditions that only hold for candidates agreeing with the actual values (AC1, SC1)
+
+
+def search_actual_causes(event, causal_setting, processes=1, chunk_size=64, ordered=True):
+    # walks the subset lattice bottom-up so that AC3 reduces to checking the weak causes already found,
+    # with processes>1 checking each level in chunks of chunk_size candidates once the weak causes of the levels below are known
+    if not event.entailed_by(causal_setting):
+        return  # AC1 fails for every candidate
+    variables = list(causal_setting.endogenous_domains.keys())
+    weak_causes = []  # bitmasks over variables
+    considered = 0  # masks of the current level drawn so far, where masks are streamed as a level can be far too large to hold
+
+    def counting(masks):
+        nonlocal considered
+        for mask in masks:
+            considered += 1
+            instrumentation.count("candidates")
+            yield mask
+
+    executor = None  # one pool of worker processes for every level
+    try:
+        for size in range(1, len(variables) + 1):
+            masks = counting(mask for mask in (sum(1 << index for index in indices) for indices in itertools.combinations(range(len(variables)), size))
+                             if not any(weak_cause & mask == weak_cause for weak_cause in weak_causes))  # supersets of a weak cause fail AC3
+            considered = 0
+            level = []
+            if processes == 1:
+                found = (mask for mask in masks if is_weak_actual_cause(actual_candidate(causal_setting, variables, mask), event, causal_setting))
+            else:
+                chunk_task = functools.partial(check_weak_actual_causes, event, causal_setting, variables)
+                if executor is None:
+                    executor = create_executor(chunk_task, processes)
+                found = run_chunks(chunk_task, chunked(masks, chunk_size), processes, ordered, executor=executor)
+            for mask in found:  # no proper subset is a weak cause, so AC3 holds
+                level.append(mask)
+                yield actual_candidate(causal_setting, variables, mask)
+            if not considered:
+                return  # every larger subset is a superset of a weak cause too
+            weak_causes.extend(level)  # subsets of the same size are never supersets of each other
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)  # also reached if the caller stops consuming results early
+
+
+def actual_candidate(causal_setting, variables, mask):  # actual values of the variables selected by mask
+    return {variable: causal_setting.values[variable] for variable in sorted(variable for index, variable in enumerate(variables) if mask >> index & 1)}
+
+
+def check_weak_actual_causes(event, causal_setting, variables, masks_chunk):  # unit of work for a chunk of a level of search_actual_causes
+    return [mask for mask in masks_chunk if is_weak_actual_cause(actual_candidate(causal_setting, variables, mask), event, causal_setting)]
+
+
+def find_candidate_causes(causal_setting, condition, variables):  # candidates over exactly variables
+    if condition in consistent_conditions:
+        return find_consistent_exact_assignments([causal_setting.values], variables)
+    return find_exact_assignments(causal_setting.endogenous_domains, variables)
+
+
+def check_candidate_causes(event, causal_setting, condition, variables_chunk):  # unit of work for a chunk of variable subsets
+    return [candidate for variables in variables_chunk for candidate in find_candidate_causes(causal_setting, condition, variables) if condition(candidate, event, causal_setting)]
+
+
+def search_candidate_causes(event, causal_setting, condition, processes=1, chunk_size=64, ordered=True):
+    # processes>1 checks chunks of chunk_size variable subsets in that many worker processes (processes=None for all cores),
+    # yielding results in the sequential order if ordered=True and otherwise as chunks complete (within each level of the lattice for is_actual_cause)
+    variables_subsets = (variables for variables in powerset(causal_setting.endogenous_domains.keys()) if variables)
+    if condition is is_actual_cause:
+        yield from search_actual_causes(event, causal_setting, processes, chunk_size, ordered)
+    elif processes != 1:
+        yield from run_chunks(functools.partial(check_candidate_causes, event, causal_setting, condition), chunked(variables_subsets, chunk_size), processes, ordered)
+    else:
+        for variables in variables_subsets:
+            for candidate in find_candidate_causes(causal_setting, condition, variables):
+                instrumentation.count("candidates")
+                if condition(candidate, event, causal_setting):
+                    yield candidate
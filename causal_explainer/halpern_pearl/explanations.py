@@ -1,51 +1,161 @@
-from causal_explainer.halpern_pearl.causes import CausalSetting, Conjunction, assignments2conjunction, satisfies_sc2, \
-    CausalFormula, Negation, find_all_assignments
-from causal_explainer.utils import powerdict
+import functools
+import operator
+
+from causal_explainer import instrumentation
+from causal_explainer.halpern_pearl import vectorized
+from causal_explainer.halpern_pearl.causes import CausalSetting, satisfies_sc2, CausalFormula, find_exact_assignments, \
+    find_consistent_exact_assignments, find_actual_cause_index, satisfies_assignments
+from causal_explainer.instrumentation import clause
+from causal_explainer.parallel import run_chunks, chunked
+from causal_explainer.utils import powerset, AssignmentCodec, submasks, LRUCache
 
 
 class EpistemicState:
-    def __init__(self, causal_network, contexts, exogenous_domains, endogenous_domains):
+    def __init__(self, causal_network, contexts, exogenous_domains, endogenous_domains, processes=1, explanation_cache_size=2 ** 4):
         self.causal_network = causal_network
         self.contexts = contexts
         self.exogenous_domains = exogenous_domains
         self.endogenous_domains = endogenous_domains
-
-    def causal_settings(self):
-        for context in self.contexts:
-            yield CausalSetting(self.causal_network, context, self.exogenous_domains, self.endogenous_domains)
-
-
+        self.processes = processes  # processes>1 finds the actual causes of settings for EX1 in that many worker processes, processes=None for all cores
+
+        self.distinct_settings = None
+        self.context_columns = None
+        self.world_columns = None
+        self.truth_vectors = dict()  # truth vectors of events in the actual worlds, keyed by event
+        self.ex1_results = dict()  # results of EX1 keyed by event and encoded candidate, shared by the subsets checked by EX2
+        self.memo = dict()  # results derived from this state, such as indexes of its explanations, keyed by kind and event
+        # explanations of events under the interventions of CE2, one oracle per event (see miller.contrastive_explanations.InterventionExplanations),
+        # explanation_cache_size=None for unbounded, explanation_cache_size=0 to disable
+        self.explanation_cache = LRUCache(explanation_cache_size)
+        self.assignment_codec = None
+
+    def distinct_causal_settings(self):  # evaluated once, with one setting for all contexts that agree on every actual and counterfactual value
+        if self.distinct_settings is None:
+            compiled = self.causal_network.compile()
+            distinct_contexts = dict()
+            for context in self.contexts:
+                assert all(context[exogenous_variable] in domain for exogenous_variable, domain in self.exogenous_domains.items())
+                distinct_contexts.setdefault(compiled.world_key(compiled.evaluate(context, self.causal_network.endogenous_bindings), self.causal_network.endogenous_bindings), context)
+            self.distinct_settings = [CausalSetting(self.causal_network, context, self.exogenous_domains, self.endogenous_domains) for context in distinct_contexts.values()]
+        return self.distinct_settings
+
+    def causal_settings(self, where=None, agreeing_with=None):  # one per distinct context (see distinct_causal_settings), filtered as in selection_vector
+        if where is None and agreeing_with is None:
+            yield from self.distinct_causal_settings()
+        else:
+            for causal_setting, selected in zip(self.distinct_causal_settings(), self.selection_vector(where, agreeing_with)):
+                if selected:
+                    yield causal_setting
+
+    def index_actual_causes(self, event, causal_settings):  # finds the actual causes of event for SC2 in each of causal_settings, in parallel if processes>1
+        if self.processes == 1:
+            return  # found lazily by satisfies_sc2 instead
+        positions = {id(causal_setting): position for position, causal_setting in enumerate(self.distinct_causal_settings())}
+        missing_positions = [positions[id(causal_setting)] for causal_setting in causal_settings if ("actual_cause_index", event) not in causal_setting.memo]
+        if len(missing_positions) > 1:
+            actual_cause_indexes = run_chunks(functools.partial(find_actual_cause_indexes, event, self), chunked(missing_positions, 1), self.processes)
+            for position, actual_cause_index in zip(missing_positions, actual_cause_indexes):
+                self.distinct_settings[position].memo["actual_cause_index", event] = actual_cause_index
+
+    def codec(self):  # encoding of assignments to endogenous variables, see AssignmentCodec
+        if self.assignment_codec is None:
+            self.assignment_codec = AssignmentCodec(self.endogenous_domains)
+        return self.assignment_codec
+
+    def columns(self):  # context columns of the distinct settings, for vectorized evaluation
+        if self.context_columns is None:
+            self.context_columns = vectorized.context_columns([causal_setting.context for causal_setting in self.distinct_causal_settings()], self.exogenous_domains.keys())
+        return self.context_columns
+
+    def truth_vector(self, event, intervention=None):  # whether [intervention]event holds in each distinct context, as a NumPy array if available
+        if intervention is None and event in self.truth_vectors:
+            return self.truth_vectors[event]
+        if vectorized.available():
+            truth_vector = vectorized.truth_vector(event, self.causal_network, self.columns(), len(self.distinct_causal_settings()), intervention)
+        elif intervention is None:
+            truth_vector = [event.entailed_by(causal_setting) for causal_setting in self.causal_settings()]
+        else:
+            truth_vector = [CausalFormula(intervention, event).entailed_by(causal_setting) for causal_setting in self.causal_settings()]
+        if intervention is None:
+            self.truth_vectors[event] = truth_vector
+        return truth_vector
+
+    def agreement_vector(self, assignments):  # whether the values of each distinct setting agree with every variable=value of assignments, as a NumPy array if available
+        if vectorized.available():
+            rows = len(self.distinct_causal_settings())
+            if self.world_columns is None:
+                self.world_columns = vectorized.evaluate_columns(self.causal_network, self.columns(), rows, self.causal_network.endogenous_bindings)
+            return vectorized.agreement_vector(self.world_columns, assignments, rows)
+        return [satisfies_assignments(assignments, causal_setting) for causal_setting in self.causal_settings()]
+
+    def selection_vector(self, where=None, agreeing_with=None, disagreeing_with=None):
+        # whether event=where holds in each distinct setting, its values agree with every variable=value of agreeing_with, and disagree with some of disagreeing_with
+        vectors = []
+        if where is not None:
+            vectors.append(self.truth_vector(where))
+        if agreeing_with is not None:
+            vectors.append(self.agreement_vector(agreeing_with))
+        if disagreeing_with is not None:
+            agreement_vector = self.agreement_vector(disagreeing_with)
+            vectors.append(~agreement_vector if vectorized.available() else [not agrees for agrees in agreement_vector])
+        if vectorized.available():
+            return functools.reduce(operator.and_, vectors)
+        return [all(selected) for selected in zip(*vectors)]
+
+    def entails_everywhere(self, event, intervention=None):
+        truth_vector = self.truth_vector(event, intervention)
+        return bool(truth_vector.all()) if vectorized.available() else all(truth_vector)
+
+    def entails_somewhere(self, event, intervention=None):
+        truth_vector = self.truth_vector(event, intervention)
+        return bool(truth_vector.any()) if vectorized.available() else any(truth_vector)
+
+    def selects_somewhere(self, where=None, agreeing_with=None, disagreeing_with=None):  # whether some distinct setting is selected, see selection_vector
+        selection_vector = self.selection_vector(where, agreeing_with, disagreeing_with)
+        return bool(selection_vector.any()) if vectorized.available() else any(selection_vector)
+
+
+def find_actual_cause_indexes(event, epistemic_state, positions):  # unit of work for a chunk of distinct settings
+    causal_settings = epistemic_state.distinct_causal_settings()
+    return [find_actual_cause_index(event, causal_settings[position]) for position in positions]
+
+
+@clause("EX1")
 def satisfies_ex1(candidate, event, epistemic_state):
-    for causal_setting in epistemic_state.causal_settings():
-        if Conjunction(assignments2conjunction(candidate), event).entailed_by(causal_setting):
-            if not satisfies_sc2(candidate, event, causal_setting):
-                return False
-        if not CausalFormula(candidate, event).entailed_by(causal_setting):
+    if not epistemic_state.entails_everywhere(event, candidate):  # [X <- x]event in every setting
+        return False
+    causal_settings = list(epistemic_state.causal_settings(where=event, agreeing_with=candidate))
+    epistemic_state.index_actual_causes(event, causal_settings)
+    for causal_setting in causal_settings:
+        if not satisfies_sc2(candidate, event, causal_setting):
             return False
     return True
 
 
+@clause("EX2")
 def satisfies_ex2(candidate, event, epistemic_state):
-    for subset_candidate in powerdict(candidate):
-        if subset_candidate and subset_candidate != candidate:
-            if satisfies_ex1(subset_candidate, event, epistemic_state):
+    codec = epistemic_state.codec()
+    mask, code = codec.encode(candidate)
+    for subset_mask in submasks(mask):
+        if subset_mask != mask:
+            key = event, subset_mask, codec.restrict(code, subset_mask)
+            if key in epistemic_state.ex1_results:
+                instrumentation.count("memo_hits")
+            else:
+                epistemic_state.ex1_results[key] = satisfies_ex1(codec.decode(*key[1:]), event, epistemic_state)
+            if epistemic_state.ex1_results[key]:
                 return False
     return True
 
 
+@clause("EX3")
 def satisfies_ex3(candidate, event, epistemic_state):
-    for causal_setting in epistemic_state.causal_settings():
-        if Conjunction(assignments2conjunction(candidate), event).entailed_by(causal_setting):
-            return True
-    return False
+    return epistemic_state.selects_somewhere(where=event, agreeing_with=candidate)
 
 
+@clause("EX4")
 def satisfies_ex4(candidate, event, epistemic_state):
-    for causal_setting in epistemic_state.causal_settings():
-        if event.entailed_by(causal_setting):
-            if Negation(assignments2conjunction(candidate)).entailed_by(causal_setting):
-                return True
-    return False
+    return epistemic_state.selects_somewhere(where=event, disagreeing_with=candidate)
 
 
 def is_explanation(candidate, event, epistemic_state):
@@ -74,7 +184,27 @@ def is_trivial_explanation(candidate, event, epistemic_state):
     return True
 
 
-def search_candidate_explanations(event, epistemic_state, condition):
-    for candidate in find_all_assignments(epistemic_state.endogenous_domains):
-        if condition(candidate, event, epistemic_state):
-            yield candidate
\ No newline at end of file
+consistent_conditions = {is_explanation, is_nontrivial_explanation, is_trivial_explanation}  # conditions that only hold for candidates agreeing with some setting where the event holds (EX3)
+
+
+def find_candidate_explanations(epistemic_state, condition, worlds, variables):  # candidates over exactly variables
+    if condition in consistent_conditions:
+        return find_consistent_exact_assignments(worlds, variables)
+    return find_exact_assignments(epistemic_state.endogenous_domains, variables)
+
+
+def check_candidate_explanations(event, epistemic_state, condition, worlds, variables_chunk):  # unit of work for a chunk of variable subsets
+    return [candidate for variables in variables_chunk for candidate in find_candidate_explanations(epistemic_state, condition, worlds, variables) if condition(candidate, event, epistemic_state)]
+
+
+def search_candidate_explanations(event, epistemic_state, condition, processes=1, chunk_size=64, ordered=True):  # see search_candidate_causes for processes, chunk_size and ordered
+    worlds = [causal_setting.values for causal_setting in epistemic_state.causal_settings(where=event)] if condition in consistent_conditions else None
+    variables_subsets = (variables for variables in powerset(epistemic_state.endogenous_domains.keys()) if variables)
+    if processes != 1:
+        yield from run_chunks(functools.partial(check_candidate_explanations, event, epistemic_state, condition, worlds), chunked(variables_subsets, chunk_size), processes, ordered)
+    else:
+        for variables in variables_subsets:
+            for candidate in find_candidate_explanations(epistemic_state, condition, worlds, variables):
+                instrumentation.count("candidates")
+                if condition(candidate, event, epistemic_state):
+                    yield candidate
@@ -0,0 +1,30 @@
+import itertools
+
+
+class TabularEquation:  # structural equation given as a table of outputs indexed by integer-encoded parent values, callable like any other equation
+    def __init__(self, parents, parent_domains, outputs):
+        self.parents = list(parents)
+        self.parent_domains = [list(domain) for domain in parent_domains]
+        self.codes = [{value: code for code, value in enumerate(domain)} for domain in self.parent_domains]
+        self.strides = [1] * len(self.parents)  # mixed radix, with the last parent varying fastest as in itertools.product
+        for position in reversed(range(len(self.parents) - 1)):
+            self.strides[position] = self.strides[position + 1] * len(self.parent_domains[position + 1])
+        self.outputs = list(outputs)
+        assert len(self.outputs) == (self.strides[0] * len(self.parent_domains[0]) if self.parents else 1)
+
+    @classmethod
+    def tabulate(cls, structural_equation, parents, domains):  # domains maps (at least) parents to finite domains, over which structural_equation is called once per combination
+        parent_domains = [list(domains[parent_variable]) for parent_variable in parents]
+        outputs = [structural_equation({parent_variable: value for parent_variable, value in zip(parents, parent_values_tuple)}) for parent_values_tuple in itertools.product(*parent_domains)]
+        return cls(parents, parent_domains, outputs)
+
+    def index(self, parent_values_tuple):  # parent_values_tuple is ordered as self.parents
+        return sum(codes[value] * stride for codes, stride, value in zip(self.codes, self.strides, parent_values_tuple))
+
+    def __call__(self, parent_values):
+        return self.outputs[self.index(parent_values[parent_variable] for parent_variable in self.parents)]
+
+    def evaluator(self, slots):  # function of a value array indexed by slot, given slots mapping (at least) parents to slots
+        terms = [(slots[parent_variable], {value: code * stride for value, code in codes.items()}) for parent_variable, codes, stride in zip(self.parents, self.codes, self.strides)]
+        outputs = self.outputs
+        return lambda values: outputs[sum(offsets[values[slot]] for slot, offsets in terms)]
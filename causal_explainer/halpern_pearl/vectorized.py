@@ -0,0 +1,141 @@
+import itertools
+
+from causal_explainer import instrumentation
+from causal_explainer.halpern_pearl.tabular import TabularEquation
+
+numpy = None  # optional dependency, available with pip install pycausalexplainer[numpy] and imported by the first call to available()
+numpy_checked = False
+
+
+def available():
+    global numpy, numpy_checked
+    if not numpy_checked:
+        numpy_checked = True
+        try:
+            import numpy
+        except ImportError:
+            pass
+    return numpy is not None
+
+
+def column(values):  # non-numeric values are kept as objects so that later bindings are not truncated to the width of a string dtype
+    array = numpy.array(values)
+    if array.ndim != 1 or array.dtype.kind not in "biuf":
+        array = numpy.fromiter(values, dtype=object, count=len(values))
+    return array
+
+
+def equals(column, value):  # rows of column equal to value, compared as whole values since == would broadcast a tuple value across the row
+    if column.dtype.kind in "biuf" and numpy.ndim(value) == 0:
+        return column == value
+    return numpy.fromiter((element == value for element in column.tolist()), dtype=bool, count=len(column))
+
+
+def context_columns(contexts, exogenous_variables):  # one column per exogenous variable, one row per context
+    return {exogenous_variable: column([context[exogenous_variable] for context in contexts]) for exogenous_variable in exogenous_variables}
+
+
+class ContextTable:  # every context over exogenous_domains, as chunks (columns, rows) of at most chunk_size rows built as they are first needed
+    def __init__(self, exogenous_domains, chunk_size=2 ** 12):
+        self.exogenous_variables = sorted(exogenous_domains)
+        self.contexts = itertools.product(*(exogenous_domains[exogenous_variable] for exogenous_variable in self.exogenous_variables))
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.complete = False
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index == len(self.chunks):
+                values_tuples = [] if self.complete else list(itertools.islice(self.contexts, self.chunk_size))
+                if not values_tuples:
+                    self.complete = True
+                    return
+                columns = {exogenous_variable: column([values_tuple[position] for values_tuple in values_tuples]) for position, exogenous_variable in enumerate(self.exogenous_variables)}
+                self.chunks.append((columns, len(values_tuples)))
+            yield self.chunks[index]
+            index += 1
+
+
+def apply_structural_equation(structural_equation, parent_variables, columns):  # scalar equations are only called once per distinct combination of parent values
+    results = dict()
+    output = []
+    for parent_values_tuple in zip(*(columns[parent_variable].tolist() for parent_variable in parent_variables)):
+        if parent_values_tuple not in results:
+            results[parent_values_tuple] = structural_equation({parent_variable: value for parent_variable, value in zip(parent_variables, parent_values_tuple)})
+        output.append(results[parent_values_tuple])
+    return column(output)
+
+
+def lookup_columns(tabular_equation, columns, rows):  # integer-encodes each parent column and indexes the table of outputs with the combined codes
+    index = numpy.zeros(rows, dtype=numpy.int64)
+    for parent_variable, codes, stride in zip(tabular_equation.parents, tabular_equation.codes, tabular_equation.strides):
+        index += stride * numpy.fromiter((codes[value] for value in columns[parent_variable].tolist()), dtype=numpy.int64, count=rows)
+    return column(tabular_equation.outputs)[index]
+
+
+def evaluate_columns(causal_network, context_columns, rows, bindings, variables=None, row_bindings=None):
+    # variables restricts evaluation to what those variables depend on
+    # row_bindings maps variables to pairs (mask, values) of columns, binding the variable to values only in the rows selected by mask
+    compiled = causal_network.compile()
+    needed = compiled.endogenous_mask if variables is None else compiled.mask(variables, compiled.ancestors)
+    columns = dict(context_columns)
+    for slot, variable, structural_equation, parents in compiled.plan:
+        if needed >> slot & 1:
+            if variable in bindings:
+                columns[variable] = numpy.repeat(column([bindings[variable]]), rows)
+                continue
+            mask, values = row_bindings[variable] if row_bindings and variable in row_bindings else (None, None)
+            if mask is not None and mask.all():
+                columns[variable] = values
+                continue
+            parent_variables = [parent_variable for parent_variable, _ in parents]
+            if variable in compiled.array_equations:
+                computed = numpy.broadcast_to(compiled.array_equations[variable]({parent_variable: columns[parent_variable] for parent_variable in parent_variables}), (rows,))
+            elif isinstance(structural_equation, TabularEquation):
+                computed = lookup_columns(structural_equation, columns, rows)
+            else:
+                computed = apply_structural_equation(structural_equation, parent_variables, columns)
+            columns[variable] = computed if mask is None else numpy.where(mask, values, computed)
+    return columns
+
+
+def agreement_vector(columns, assignments, rows):  # whether each row agrees with every variable=value of assignments
+    agrees = numpy.ones(rows, dtype=bool)
+    for variable, value in assignments.items():
+        agrees &= equals(columns[variable], value)
+    return agrees
+
+
+def truth_vector(event, causal_network, context_columns, rows, intervention=None):  # intervention=None evaluates the actual worlds of causal_network
+    bindings = causal_network.endogenous_bindings if intervention is None else intervention  # an intervention replaces existing bindings, as in CausalNetwork.intervene
+    if intervention is not None:
+        instrumentation.count("counterfactuals", rows)
+    return numpy.asarray(event.holds_columns(evaluate_columns(causal_network, context_columns, rows, bindings, event.variables())), dtype=bool)
+
+
+def holds_in_all(event, causal_network, context_table, intervention):  # whether [intervention]event holds in every context of context_table, stopping at the first chunk where it fails
+    return all(truth_vector(event, causal_network, columns, rows, intervention).all() for columns, rows in context_table)
+
+
+def truth_vector_interventions(event, causal_network, context, interventions):  # whether [intervention]event holds in context, for each of interventions
+    rows = len(interventions)
+    instrumentation.count("counterfactuals", rows)
+    columns = {variable: numpy.repeat(column([value]), rows) for variable, value in context.items()}
+    row_bindings = dict()
+    for variable in set().union(*interventions):
+        default = next(intervention[variable] for intervention in interventions if variable in intervention)  # placeholder for rows where variable is not bound
+        mask = numpy.fromiter((variable in intervention for intervention in interventions), dtype=bool, count=rows)
+        row_bindings[variable] = mask, column([intervention.get(variable, default) for intervention in interventions])
+    return numpy.asarray(event.holds_columns(evaluate_columns(causal_network, columns, rows, dict(), event.variables(), row_bindings)), dtype=bool)
+
+
+def filter_interventions(event, causal_network, context, interventions, batch_size):  # lazily yields the interventions after which event holds, in order
+    interventions = iter(interventions)
+    while True:
+        batch = list(itertools.islice(interventions, batch_size))
+        if not batch:
+            return
+        for intervention, holds in zip(batch, truth_vector_interventions(event, causal_network, context, batch).tolist()):
+            if holds:
+                yield intervention
@@ -0,0 +1,84 @@
+import contextlib
+import functools
+import time
+from collections import Counter
+
+# instrumentation of queries, which is off (and nearly free) unless a query runs inside collect(), e.g.
+#     with collect() as stats:
+#         actual_causes = list(search_candidate_causes(event, causal_setting, is_actual_cause))
+#     print(stats)
+# only work done in this process is recorded, so not that of worker processes when processes>1
+
+active = None  # stats of the query being collected, if any
+
+
+class QueryStats:
+    def __init__(self, trace_callbacks=()):
+        self.counts = Counter()  # candidates, counterfactuals, witnesses, cache_hits, memo_hits, sat_solves
+        self.clause_calls = Counter()
+        self.clause_failures = Counter()
+        self.clause_seconds = Counter()  # inclusive of nested clauses, e.g. AC3 includes the AC1 and AC2 checks of subsets
+        self.trace_callbacks = list(trace_callbacks)  # each called as callback(clause, args, result, seconds) after every clause
+        self.seconds = 0.0
+
+    def count(self, name, amount=1):
+        self.counts[name] += amount
+
+    def record_clause(self, name, args, result, seconds):
+        self.clause_calls[name] += 1
+        self.clause_seconds[name] += seconds
+        if not result:
+            self.clause_failures[name] += 1
+        for trace_callback in self.trace_callbacks:
+            trace_callback(name, args, result, seconds)
+
+    def __str__(self):
+        lines = [f"query: {self.seconds:.6f}s"]
+        lines += [f"{name}: {amount}" for name, amount in sorted(self.counts.items())]
+        lines += [f"{name}: {self.clause_calls[name]} calls, {self.clause_failures[name]} failed, {self.clause_seconds[name]:.6f}s" for name in sorted(self.clause_calls)]
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def collect(*trace_callbacks):  # yields the stats of the query run inside the with block, where generators must also be consumed
+    global active
+    previous = active
+    active = stats = QueryStats(trace_callbacks)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        active = previous
+
+
+def count(name, amount=1):
+    if active is not None:
+        active.count(name, amount)
+
+
+def counted(name, iterable):  # counts the items drawn from iterable
+    for item in iterable:
+        count(name)
+        yield item
+
+
+def clause(name):  # decorator recording the calls, failures and time of a clause of a definition, e.g. @clause("AC2")
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = active
+            if stats is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            stats.record_clause(name, args, result, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorate
+
+
+def logging_trace(logger):  # trace callback logging each clause at debug level
+    def trace(name, args, result, seconds):
+        logger.debug("%s %s for %s in %.6fs", name, "passed" if result else "failed", args[0] if args else None, seconds)
+    return trace
@@ -1,23 +1,95 @@
+import functools
 import itertools
 import logging
 
+from causal_explainer import instrumentation
 from causal_explainer.halpern_pearl.causes import search_candidate_causes, is_actual_cause, is_sufficient_cause, \
     CausalSetting, Negation
-from causal_explainer.utils import issubdict, powerset, powerlist
+from causal_explainer.instrumentation import clause
+from causal_explainer.parallel import run_chunks, chunked
+from causal_explainer.utils import powerset, powerlist, submasks, SubsetIndex
 
 logger = logging.getLogger("miller_counterfactual")
-logging.basicConfig(level=logging.INFO)
+
+
+def find_cause_index(event, causal_setting, sufficient=False):  # causes of event in causal_setting indexed for subset queries, found once per event
+    key = "cause_index", event, sufficient
+    if key in causal_setting.memo:
+        instrumentation.count("memo_hits")
+    else:
+        causal_setting.memo[key] = SubsetIndex(causal_setting.codec(), search_candidate_causes(event, causal_setting, is_sufficient_cause if sufficient else is_actual_cause))
+    return causal_setting.memo[key]
 
 
 def is_partial_cause(candidate, event, causal_setting, sufficient=False):  # sufficient=True uses sufficient causes while sufficient=False used actual causes
-    if candidate:
-        for cause in search_candidate_causes(event, causal_setting, is_sufficient_cause) if sufficient else search_candidate_causes(event, causal_setting, is_actual_cause):
-            if issubdict(candidate, cause):
-                logger.debug(f"\t\t\t{candidate} is partial {'sufficient' if sufficient else 'actual'} cause of {event} due to {'sufficient' if sufficient else 'actual'} cause {cause}")
-                return True
+    if candidate and find_cause_index(event, causal_setting, sufficient).contains(candidate):
+        logger.debug("%s is partial %s cause of %s", candidate, "sufficient" if sufficient else "actual", event)
+        return True
     return False
 
 
+def find_partial_causes(candidates, event, causal_setting, sufficient=False):  # bulk form of is_partial_cause, yielding the candidates that are partial causes
+    cause_index = find_cause_index(event, causal_setting, sufficient)
+    for candidate in candidates:
+        if candidate and cause_index.contains(candidate):
+            yield candidate
+
+
+def bifactual_setting(causal_network, context, exogenous_domains, endogenous_domains):  # settings of BC1 and BC2 are kept by the network, so that their cause indexes are reused
+    compiled = causal_network.compile()  # replaced whenever the structure changes, making settings found before stale
+    key = compiled.context_key(context)
+    settings = causal_network.settings.get(key, [])  # least recently used contexts are evicted, along with the memos of their settings
+    for setting_compiled, causal_setting in settings:
+        if setting_compiled is compiled and causal_setting.exogenous_domains == exogenous_domains and causal_setting.endogenous_domains == endogenous_domains:
+            return causal_setting
+    causal_setting = CausalSetting(causal_network, context, exogenous_domains, endogenous_domains)
+    causal_network.settings.put(key, [(setting_compiled, other) for setting_compiled, other in settings if setting_compiled is compiled] + [(compiled, causal_setting)])
+    return causal_setting
+
+
+class InterventionCauses:
+    # causes of event in causal_setting intervened on by each w of CC3, found lazily in the order of the w and kept as codes (see AssignmentCodec),
+    # so a query only searches the intervened settings that no earlier query needed
+    def __init__(self, event, causal_setting, sufficient=False):
+        self.event = event
+        self.causal_setting = causal_setting
+        self.condition = is_sufficient_cause if sufficient else is_actual_cause
+        self.interventions = self.find_interventions()
+        self.cause_index = SubsetIndex(causal_setting.codec())  # causes under the interventions searched so far
+
+    def find_interventions(self):
+        all_w_variables = sorted(self.causal_setting.endogenous_domains.keys())
+        # all_w_variables = sorted(causal_setting.endogenous_domains.keys() - candidate_alt.keys())
+        for w_variables_tuple in powerlist(all_w_variables):
+            if w_variables_tuple:
+                w_domains_tuple = [self.causal_setting.endogenous_domains[w_variable] for w_variable in w_variables_tuple]
+                for w_values_tuple in itertools.product(*w_domains_tuple):
+                    yield {variable: value for variable, value in zip(w_variables_tuple, w_values_tuple)}
+
+    def contains(self, candidate):  # whether candidate is part of a cause under some intervention w
+        if not candidate:
+            return False
+        if self.cause_index.contains(candidate):
+            instrumentation.count("memo_hits")
+            return True
+        for w in self.interventions:
+            new_causal_setting = self.causal_setting.intervene(w)
+            # new_causal_setting = causal_setting.intervene({**candidate_alt, **w})
+            for cause in search_candidate_causes(self.event, new_causal_setting, self.condition):
+                self.cause_index.add(*self.cause_index.codec.encode(cause))
+            if self.cause_index.contains(candidate):
+                logger.debug("%s is partial cause of %s under intervention %s", candidate, self.event, w)
+                return True
+        return False
+
+
+def find_intervention_causes(event, causal_setting, sufficient=False):  # built once per event and setting, and shared by every check of CC3
+    key = "intervention_causes", event, sufficient
+    if key not in causal_setting.memo:
+        causal_setting.memo[key] = InterventionCauses(event, causal_setting, sufficient)
+    return causal_setting.memo[key]
+
+
 def difference_condition(candidate_pair):
     candidate, candidate_alt = candidate_pair
     return all(value != candidate_alt[variable] for variable, value in candidate.items())
@@ -41,35 +113,74 @@ def find_all_assignment_pairs(domains):
             yield from find_exact_assignment_pairs(domains, variables)
 
 
+def find_subassignments(index):  # every non-empty part of the assignments in index (see SubsetIndex), encoded and without duplicates
+    found = dict()  # as an ordered set
+    for mask, code in index.members:
+        for submask in submasks(mask):
+            found.setdefault((submask, index.codec.restrict(code, submask)))
+    return list(found)
+
+
+def find_alternative_pairs(candidates, codec):  # pairs of each encoded candidate with every alternative satisfying the difference condition
+    for mask, code in candidates:
+        candidate = codec.decode(mask, code)
+        for code_alt in codec.exact_codes(mask, differing_from=code):
+            yield candidate, codec.decode(mask, code_alt)
+
+
+def find_superset_pairs(candidate_pair, index):
+    # proper superset pairs of candidate_pair extended by assignment pairs satisfying the difference condition, where the superset candidate
+    # is part of some assignment in index (see SubsetIndex), so extensions are taken from the indexed assignments rather than every domain
+    candidate, candidate_alt = candidate_pair
+    if not index.contains(candidate):
+        return  # neither is any superset
+    codec = index.codec
+    mask, code = codec.encode(candidate)
+    mask_alt, code_alt = codec.encode(candidate_alt)
+    supersets = index.supersets(mask, code)
+    found = set()
+    for (member_mask, member_code), bit in index.members.items():
+        if supersets & bit:
+            for extension_mask in submasks(member_mask & ~mask):
+                extension_code = codec.restrict(member_code, extension_mask)
+                if (extension_mask, extension_code) not in found:
+                    found.add((extension_mask, extension_code))
+                    superset_candidate = codec.decode(mask | extension_mask, code | extension_code)
+                    for extension_code_alt in codec.exact_codes(extension_mask, differing_from=extension_code):
+                        yield superset_candidate, codec.decode(mask_alt | extension_mask, code_alt | extension_code_alt)
+
+
+@clause("BC1")
 def satisfies_bc1(candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs):
     candidate, _ = candidate_pair
     event, _ = event_pair
     context, _ = context_pair
-    causal_setting = CausalSetting(causal_network, context, exogenous_domains, endogenous_domains)
+    causal_setting = bifactual_setting(causal_network, context, exogenous_domains, endogenous_domains)
     return is_partial_cause(candidate, event, causal_setting, **kwargs)
 
 
+@clause("BC2")
 def satisfies_bc2(candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs):
     _, candidate_alt = candidate_pair
     _, event_alt = event_pair
     _, context_alt = context_pair
-    causal_setting_alt = CausalSetting(causal_network, context_alt, exogenous_domains, endogenous_domains)
+    causal_setting_alt = bifactual_setting(causal_network, context_alt, exogenous_domains, endogenous_domains)
     return is_partial_cause(candidate_alt, event_alt, causal_setting_alt, **kwargs)
 
 
+@clause("BC3")
 def satisfies_bc3(candidate_pair):
     return difference_condition(candidate_pair)
 
 
+@clause("BC4")
 def satisfies_bc4(candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs):
-    candidate, candidate_alt = candidate_pair
-    remaining_variables = endogenous_domains.keys() - candidate.keys()
-    for subset_remaining_variables in powerset(remaining_variables):
-        if subset_remaining_variables:  # only consider proper supersets
-            for candidate_extension, candidate_extension_alt in find_exact_assignment_pairs(endogenous_domains, subset_remaining_variables):
-                superset_candidate_pair = {**candidate, **candidate_extension}, {**candidate_alt, **candidate_extension_alt}
-                if satisfies_bc3(superset_candidate_pair) and satisfies_bc1(superset_candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs) and satisfies_bc2(superset_candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs):
-                    return False
+    event, _ = event_pair
+    context, _ = context_pair
+    causal_setting = bifactual_setting(causal_network, context, exogenous_domains, endogenous_domains)
+    for superset_candidate_pair in find_superset_pairs(candidate_pair, find_cause_index(event, causal_setting, **kwargs)):  # superset pairs satisfying BC1
+        if satisfies_bc3(superset_candidate_pair) and satisfies_bc2(superset_candidate_pair, event_pair, causal_network, context_pair, exogenous_domains, endogenous_domains, **kwargs):
+            return False
     return True
 
 
@@ -85,78 +196,71 @@ def is_contrastive_bifactual_cause(candidate_pair, event_pair, causal_network, c
     return True
 
 
+@clause("CC1")
 def satisfies_cc1(candidate_pair, event_pair, causal_setting, **kwargs):
     candidate, _ = candidate_pair
     fact, _ = event_pair
     return is_partial_cause(candidate, fact, causal_setting, **kwargs)
 
 
+@clause("CC2")
 def satisfies_cc2(event_pair, causal_setting):
     _, foil = event_pair
     return Negation(foil).entailed_by(causal_setting)
 
 
+@clause("CC3")
 def satisfies_cc3(candidate_pair, event_pair, causal_setting, **kwargs):
     _, candidate_alt = candidate_pair
     _, foil = event_pair
-    all_w_variables = sorted(causal_setting.endogenous_domains.keys())
-    # all_w_variables = sorted(causal_setting.endogenous_domains.keys() - candidate_alt.keys())
-    for w_variables_tuple in powerlist(all_w_variables):
-        if w_variables_tuple:
-            w_domains_tuple = [causal_setting.endogenous_domains[w_variable] for w_variable in w_variables_tuple]
-            for w_values_tuple in itertools.product(*w_domains_tuple):
-                w = {variable: value for variable, value in zip(w_variables_tuple, w_values_tuple)}
-                new_causal_network = causal_setting.causal_network.intervene(w)
-                # new_causal_network = causal_setting.causal_network.intervene({**candidate_alt, **w})
-                new_causal_setting = CausalSetting(new_causal_network, causal_setting.context, causal_setting.exogenous_domains, causal_setting.endogenous_domains)
-                if is_partial_cause(candidate_alt, foil, new_causal_setting, **kwargs):
-                    logger.debug(f"\t\t\tunder intervention {w}")
-                    return True
-    logger.debug(f"\t\t\tno intervention w such that {candidate_alt} is partial cause of {foil}")
+    if find_intervention_causes(foil, causal_setting, **kwargs).contains(candidate_alt):
+        return True
+    logger.debug("no intervention w such that %s is partial cause of %s", candidate_alt, foil)
     return False
 
 
+@clause("CC4")
 def satisfies_cc4(candidate_pair):
     return difference_condition(candidate_pair)
 
 
+@clause("CC5")
 def satisfies_cc5(candidate_pair, event_pair, causal_setting, **kwargs):
-    candidate, candidate_alt = candidate_pair
-    remaining_x_variables = causal_setting.endogenous_domains.keys() - candidate.keys()
-    for subset_remaining_x_variables in powerset(remaining_x_variables):
-        if subset_remaining_x_variables:  # only consider proper supersets
-            for candidate_extension, candidate_extension_alt in find_exact_assignment_pairs(causal_setting.endogenous_domains, subset_remaining_x_variables):
-                superset_candidate_pair = {**candidate, **candidate_extension}, {**candidate_alt, **candidate_extension_alt}
-                if satisfies_cc4(superset_candidate_pair) and satisfies_cc1(superset_candidate_pair, event_pair, causal_setting, **kwargs) and satisfies_cc3(superset_candidate_pair, event_pair, causal_setting, **kwargs):
-                    return False
+    fact, _ = event_pair
+    for superset_candidate_pair in find_superset_pairs(candidate_pair, find_cause_index(fact, causal_setting, **kwargs)):  # superset pairs satisfying CC1
+        if satisfies_cc4(superset_candidate_pair) and satisfies_cc3(superset_candidate_pair, event_pair, causal_setting, **kwargs):
+            return False
     return True
 
 
 def is_contrastive_counterfactual_cause(candidate_pair, event_pair, causal_setting, **kwargs):
     if not satisfies_cc2(event_pair, causal_setting):
-        logger.debug(f"\t\tCC2 failed")
         return False
-    logger.debug(f"\t\tCC2 passed")
     if not satisfies_cc4(candidate_pair):
-        logger.debug(f"\t\tCC4 failed")
         return False
-    logger.debug(f"\t\tCC4 passed")
     if not satisfies_cc1(candidate_pair, event_pair, causal_setting, **kwargs):
-        logger.debug(f"\t\tCC1 failed")
         return False
-    logger.debug(f"\t\tCC1 passed")
     if not satisfies_cc3(candidate_pair, event_pair, causal_setting, **kwargs):
-        logger.debug(f"\t\tCC3 failed")
         return False
-    logger.debug(f"\t\tCC3 passed")
     if not satisfies_cc5(candidate_pair, event_pair, causal_setting, **kwargs):
-        logger.debug(f"\t\tCC5 failed")
         return False
-    logger.debug(f"\t\tCC5 passed")
     return True
 
 
-def find_contrastive_counterfactual_causes(event_pair, causal_setting):
-    for candidate_pair in find_all_assignment_pairs(causal_setting.endogenous_domains):
+def check_contrastive_counterfactual_causes(event_pair, causal_setting, candidates_chunk):  # unit of work for a chunk of encoded candidates
+    return [candidate_pair for candidate_pair in find_alternative_pairs(candidates_chunk, causal_setting.codec()) if is_contrastive_counterfactual_cause(candidate_pair, event_pair, causal_setting)]
+
+
+def find_contrastive_counterfactual_causes(event_pair, causal_setting, processes=1, chunk_size=1, ordered=True):  # see search_candidate_causes for processes, chunk_size and ordered
+    # CC1 only holds for parts of actual causes of the fact, so candidates are taken from those and alternatives are only generated for them
+    if not satisfies_cc2(event_pair, causal_setting):
+        return
+    fact, _ = event_pair
+    candidates = find_subassignments(find_cause_index(fact, causal_setting))
+    if processes != 1:
+        yield from run_chunks(functools.partial(check_contrastive_counterfactual_causes, event_pair, causal_setting), chunked(candidates, chunk_size), processes, ordered)
+        return
+    for candidate_pair in find_alternative_pairs(candidates, causal_setting.codec()):
+        instrumentation.count("candidates")
         if is_contrastive_counterfactual_cause(candidate_pair, event_pair, causal_setting):
             yield candidate_pair
@@ -1,53 +1,105 @@
 import logging
 
+from causal_explainer import instrumentation
 from causal_explainer.halpern_pearl.causes import find_all_assignments
-from causal_explainer.halpern_pearl.explanations import search_candidate_explanations, is_explanation, EpistemicState
-from causal_explainer.miller.contrastive_causes import difference_condition, find_exact_assignment_pairs, find_all_assignment_pairs
-from causal_explainer.utils import issubdict, powerset
+from causal_explainer.halpern_pearl.explanations import search_candidate_explanations, is_explanation, is_nontrivial_explanation, EpistemicState
+from causal_explainer.instrumentation import clause
+from causal_explainer.miller.contrastive_causes import difference_condition, find_superset_pairs, find_subassignments, find_alternative_pairs
+from causal_explainer.utils import SubsetIndex
 
 logger = logging.getLogger("explanations")
-logging.basicConfig(level=logging.INFO)
+
+
+def find_explanation_index(event, epistemic_state, nontrivial=False):  # explanations of event in epistemic_state indexed for subset queries, found once per event
+    key = "explanation_index", event, nontrivial
+    if key in epistemic_state.memo:
+        instrumentation.count("memo_hits")
+    else:
+        epistemic_state.memo[key] = SubsetIndex(epistemic_state.codec(), search_candidate_explanations(event, epistemic_state, is_nontrivial_explanation if nontrivial else is_explanation))
+    return epistemic_state.memo[key]
 
 
 def is_partial_explanation(candidate, event, epistemic_state, nontrivial=False):  # nontrivial=False permits trivial explanations
-    if candidate:
-        for explanation in search_candidate_explanations(event, epistemic_state, is_nontrivial_explanation) if nontrivial else search_candidate_explanations(event, epistemic_state, is_explanation):
-            if issubdict(candidate, explanation):
-                logger.debug(f"\t\t\t{candidate} is partial {'nontrivial' if nontrivial else ''} explanation of {event} due to {'nontrivial' if nontrivial else ''} explanation {explanation}")
-                return True
+    if candidate and find_explanation_index(event, epistemic_state, nontrivial).contains(candidate):
+        logger.debug("%s is partial %sexplanation of %s", candidate, "nontrivial " if nontrivial else "", event)
+        return True
     return False
 
 
+def find_partial_explanations(candidates, event, epistemic_state, nontrivial=False):  # bulk form of is_partial_explanation, yielding the candidates that are partial explanations
+    explanation_index = find_explanation_index(event, epistemic_state, nontrivial)
+    for candidate in candidates:
+        if candidate and explanation_index.contains(candidate):
+            yield candidate
+
+
+class InterventionExplanations:
+    # explanations of event in epistemic_state intervened on by each w of CE2, found lazily in the order of the w and shared by every check of CE2,
+    # where each intervened state is built only when reached and dropped after its search, and only explanations not already part of an indexed one are kept
+    def __init__(self, event, epistemic_state, nontrivial=False):
+        self.event = event
+        self.epistemic_state = epistemic_state
+        self.condition = is_nontrivial_explanation if nontrivial else is_explanation
+        self.interventions = find_all_assignments(epistemic_state.endogenous_domains)
+        self.explanation_index = SubsetIndex(epistemic_state.codec())  # explanations under the interventions searched so far
+
+    def contains(self, candidate):  # whether candidate is part of an explanation under some intervention w
+        if not candidate:
+            return False
+        if self.explanation_index.contains(candidate):
+            instrumentation.count("memo_hits")
+            return True
+        codec = self.explanation_index.codec
+        for w in self.interventions:
+            new_causal_network = self.epistemic_state.causal_network.intervene(w)
+            new_epistemic_state = EpistemicState(new_causal_network, self.epistemic_state.contexts, self.epistemic_state.exogenous_domains, self.epistemic_state.endogenous_domains)
+            new_epistemic_state.assignment_codec = codec
+            for explanation in search_candidate_explanations(self.event, new_epistemic_state, self.condition):
+                mask, code = codec.encode(explanation)
+                if not self.explanation_index.supersets(mask, code):
+                    self.explanation_index.add(mask, code)
+            if self.explanation_index.contains(candidate):
+                logger.debug("%s is partial explanation of %s under intervention %s", candidate, self.event, w)
+                return True
+        return False
+
+
+def find_intervention_explanations(event, epistemic_state, nontrivial=False):
+    # built once per event and state and shared by every check of CE2, while kept in the explanation cache of epistemic_state,
+    # which drops whole oracles of the least recently used events rather than the explanations under single interventions
+    key = event, nontrivial
+    intervention_explanations = epistemic_state.explanation_cache.get(key)
+    if intervention_explanations is None:
+        intervention_explanations = InterventionExplanations(event, epistemic_state, nontrivial)
+        epistemic_state.explanation_cache.put(key, intervention_explanations)
+    return intervention_explanations
+
+
+@clause("CE1")
 def satisfies_ce1(candidate_pair, event_pair, epistemic_state, **kwargs):
     candidate, _ = candidate_pair
     fact, _ = event_pair
     return is_partial_explanation(candidate, fact, epistemic_state, **kwargs)
 
 
+@clause("CE2")
 def satisfies_ce2(candidate_pair, event_pair, epistemic_state, **kwargs):
     _, candidate_alt = candidate_pair
     _, foil = event_pair
-    for w in find_all_assignments(epistemic_state.endogenous_domains):
-        new_causal_network = epistemic_state.causal_network.intervene(w)
-        new_epistemic_state = EpistemicState(new_causal_network, epistemic_state.contexts, epistemic_state.exogenous_domains, epistemic_state.endogenous_domains)
-        if is_partial_explanation(candidate_alt, foil, new_epistemic_state, **kwargs):
-            return True
-    return False
+    return find_intervention_explanations(foil, epistemic_state, **kwargs).contains(candidate_alt)
 
 
+@clause("CE3")
 def satisfies_ce3(candidate_pair):
     return difference_condition(candidate_pair)
 
 
+@clause("CE4")
 def satisfies_ce4(candidate_pair, event_pair, epistemic_state, **kwargs):
-    candidate, candidate_alt = candidate_pair
-    remaining_variables = epistemic_state.endogenous_domains.keys() - candidate.keys()
-    for subset_remaining_variables in powerset(remaining_variables):
-        if subset_remaining_variables:  # only consider proper supersets
-            for candidate_extension, candidate_extension_alt in find_exact_assignment_pairs(epistemic_state.endogenous_domains, subset_remaining_variables):
-                superset_candidate_pair = {**candidate, **candidate_extension}, {**candidate_alt, **candidate_extension_alt}
-                if satisfies_ce3(superset_candidate_pair) and satisfies_ce1(superset_candidate_pair, event_pair, epistemic_state, **kwargs) and satisfies_ce2(superset_candidate_pair, event_pair, epistemic_state):
-                    return False
+    fact, _ = event_pair
+    for superset_candidate_pair in find_superset_pairs(candidate_pair, find_explanation_index(fact, epistemic_state, **kwargs)):  # superset pairs satisfying CE1
+        if satisfies_ce3(superset_candidate_pair) and satisfies_ce2(superset_candidate_pair, event_pair, epistemic_state):
+            return False
     return True
 
 
@@ -64,6 +116,9 @@ def is_contrastive_counterfactual_explanation(candidate_pair, event_pair, episte
 
 
 def find_contrastive_counterfactual_explanations(event_pair, epistemic_state, **kwargs):
-    for candidate_pair in find_all_assignment_pairs(epistemic_state.endogenous_domains):
+    # CE1 only holds for parts of explanations of the fact, so candidates are taken from those and alternatives are only generated for them
+    fact, _ = event_pair
+    for candidate_pair in find_alternative_pairs(find_subassignments(find_explanation_index(fact, epistemic_state, **kwargs)), epistemic_state.codec()):
+        instrumentation.count("candidates")
         if is_contrastive_counterfactual_explanation(candidate_pair, event_pair, epistemic_state, **kwargs):
             yield candidate_pair
@@ -0,0 +1,63 @@
+import itertools
+import os
+from collections import deque
+
+task = None  # set in each worker process, which inherits it rather than unpickling it where the fork start method is available
+
+
+def initialize_worker(worker_task):
+    global task
+    task = worker_task
+
+
+def run_task(chunk):
+    return task(chunk)
+
+
+def chunked(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def create_executor(chunk_task, processes=None):  # pool of worker processes running chunk_task, for run_chunks, where processes=None uses all cores
+    import multiprocessing  # imported on demand to keep sequential use of the package light
+    from concurrent.futures import ProcessPoolExecutor
+    # structural equations are typically lambdas, which cannot be pickled, so workers are forked where possible
+    mp_context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return ProcessPoolExecutor(processes, mp_context=mp_context, initializer=initialize_worker, initargs=(chunk_task,))
+
+
+def run_chunks(chunk_task, chunks, processes=None, ordered=True, window=None, executor=None):
+    # chunk_task maps a chunk to a list of results, processes=None uses all cores
+    # at most window chunks (by default twice the number of processes) are in flight at once, so chunks are drawn from chunks as results are consumed
+    # executor, from create_executor with the same chunk_task, is reused and left running, e.g. across the levels of a search; otherwise a pool is created for this call
+    from concurrent.futures import wait, FIRST_COMPLETED
+    owned = executor is None
+    if owned:
+        executor = create_executor(chunk_task, processes)
+    window = window or 2 * (processes or os.cpu_count() or 1)
+    chunks = iter(chunks)
+    pending = deque()
+    try:
+        pending.extend(executor.submit(run_task, chunk) for chunk in itertools.islice(chunks, window))
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(executor.submit(run_task, chunk))
+                yield from future.result()
+    finally:
+        if owned:
+            executor.shutdown(wait=True, cancel_futures=True)  # also reached if the caller stops consuming results early
+        else:
+            for future in pending:  # results of a shared pool that nobody will consume
+                future.cancel()
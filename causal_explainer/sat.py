@@ -0,0 +1,188 @@
+class CNF:  # clauses are lists of non-zero integers, where -v is the negation of variable v (as in DIMACS)
+    def __init__(self):
+        self.num_variables = 0
+        self.clauses = []
+
+    def new_variable(self):
+        self.num_variables += 1
+        return self.num_variables
+
+    def add_clause(self, literals):
+        self.clauses.append(list(literals))
+
+    def copy(self):
+        cnf = CNF()
+        cnf.num_variables = self.num_variables
+        cnf.clauses = list(self.clauses)
+        return cnf
+
+    def add_at_most(self, literals, k):  # sequential counter encoding [Sinz, 2005]
+        literals = list(literals)
+        if k >= len(literals):
+            return
+        if k == 0:
+            for literal in literals:
+                self.add_clause([-literal])
+            return
+        counters = [[self.new_variable() for _ in range(k)] for _ in literals[:-1]]  # counters[i][j] holds if more than j of literals[:i+1] hold
+        for i, literal in enumerate(literals):
+            if i < len(literals) - 1:
+                self.add_clause([-literal, counters[i][0]])
+            if i > 0:
+                self.add_clause([-literal, -counters[i - 1][k - 1]])
+                if i < len(literals) - 1:
+                    for j in range(k):
+                        self.add_clause([-counters[i - 1][j], counters[i][j]])
+                    for j in range(1, k):
+                        self.add_clause([-literal, -counters[i - 1][j - 1], counters[i][j]])
+            if i == 0:
+                for j in range(1, k):
+                    self.add_clause([-counters[0][j]])
+
+
+def solve(cnf):  # conflict-driven clause learning, returns a model mapping variables to bools or None if unsatisfiable
+    n = cnf.num_variables
+    assigns = [None] * (n + 1)
+    levels = [0] * (n + 1)
+    reasons = [None] * (n + 1)
+    activity = [0.0] * (n + 1)
+    phases = [False] * (n + 1)
+    trail = []
+    trail_limits = []  # position in trail of each decision
+    watches = [[] for _ in range(2 * n + 2)]  # clauses watching each literal, indexed by watch_index
+    state = {"head": 0, "bump": 1.0}
+
+    def watch_index(literal):
+        return 2 * literal if literal > 0 else -2 * literal + 1
+
+    def value(literal):
+        assign = assigns[abs(literal)]
+        return None if assign is None else assign == (literal > 0)
+
+    def enqueue(literal, reason):
+        variable = abs(literal)
+        assigns[variable] = literal > 0
+        levels[variable] = len(trail_limits)
+        reasons[variable] = reason
+        trail.append(literal)
+
+    def attach(clause):
+        watches[watch_index(clause[0])].append(clause)
+        watches[watch_index(clause[1])].append(clause)
+
+    def propagate():  # returns a conflicting clause, if any
+        while state["head"] < len(trail):
+            false_literal = -trail[state["head"]]
+            state["head"] += 1
+            watching = watches[watch_index(false_literal)]
+            kept = []
+            conflict = None
+            for position, clause in enumerate(watching):
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if value(clause[0]) is True:
+                    kept.append(clause)
+                    continue
+                for other in range(2, len(clause)):
+                    if value(clause[other]) is not False:
+                        clause[1], clause[other] = clause[other], clause[1]
+                        watches[watch_index(clause[1])].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value(clause[0]) is False:
+                        conflict = clause
+                        kept.extend(watching[position + 1:])
+                        break
+                    enqueue(clause[0], clause)
+            watches[watch_index(false_literal)] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def analyze(conflict):  # first unique implication point, returns the learnt clause (asserting literal first) and the level to backjump to
+        seen = set()
+        learnt = [None]
+        counter = 0
+        level = len(trail_limits)
+        index = len(trail) - 1
+        clause = conflict
+        while True:
+            for literal in clause:
+                variable = abs(literal)
+                if variable not in seen and levels[variable] > 0:
+                    seen.add(variable)
+                    activity[variable] += state["bump"]
+                    if levels[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(literal)
+            while abs(trail[index]) not in seen:
+                index -= 1
+            literal = trail[index]
+            index -= 1
+            clause = reasons[abs(literal)]
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        highest = max(range(1, len(learnt)), key=lambda position: levels[abs(learnt[position])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, levels[abs(learnt[1])]
+
+    def cancel_until(level):
+        if len(trail_limits) > level:
+            for literal in trail[trail_limits[level]:]:
+                variable = abs(literal)
+                phases[variable] = assigns[variable]
+                assigns[variable] = None
+                reasons[variable] = None
+            del trail[trail_limits[level]:]
+            del trail_limits[level:]
+            state["head"] = len(trail)
+
+    for clause in cnf.clauses:
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            continue  # tautology
+        if not clause:
+            return None
+        if len(clause) == 1:
+            if value(clause[0]) is False:
+                return None
+            if value(clause[0]) is None:
+                enqueue(clause[0], None)
+        else:
+            attach(clause)
+
+    conflicts, restart_limit = 0, 100
+    while True:
+        conflict = propagate()
+        if conflict is not None:
+            if not trail_limits:
+                return None
+            learnt, level = analyze(conflict)
+            cancel_until(level)
+            if len(learnt) == 1:
+                enqueue(learnt[0], None)
+            else:
+                attach(learnt)
+                enqueue(learnt[0], learnt)
+            state["bump"] /= 0.95  # decay older activity relative to new bumps
+            if state["bump"] > 1e100:
+                for variable in range(1, n + 1):
+                    activity[variable] *= 1e-100
+                state["bump"] *= 1e-100
+            conflicts += 1
+            if conflicts >= restart_limit:
+                conflicts, restart_limit = 0, int(restart_limit * 1.5)
+                cancel_until(0)
+        else:
+            unassigned = [variable for variable in range(1, n + 1) if assigns[variable] is None]
+            if not unassigned:
+                return {variable: assigns[variable] for variable in range(1, n + 1)}
+            variable = max(unassigned, key=activity.__getitem__)
+            trail_limits.append(len(trail))
+            enqueue(variable if phases[variable] else -variable, None)
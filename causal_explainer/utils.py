@@ -1,4 +1,5 @@
-from frozendict import frozendict
+import itertools
+from collections import OrderedDict, namedtuple
 
 
 def format_dict(data, sep_item=", ", sep_key_value="=", brackets=True):
@@ -36,4 +37,170 @@ def issubdict(a, b):
 
 
 def freeze(dict_iter):
+    from frozendict import frozendict
     return {frozendict(dict_item) for dict_item in dict_iter}
+
+
+class AssignmentCodec:
+    # assignments over finite domains encoded as pairs (mask, code) of integers, where bit i of mask marks variables[i] as assigned
+    # and code packs the index of its value in a field of bits, so restrictions and subset tests (see SubsetIndex) are bit operations
+    def __init__(self, domains):
+        self.variables = sorted(domains)
+        self.positions = {variable: position for position, variable in enumerate(self.variables)}
+        self.values = [list(domains[variable]) for variable in self.variables]
+        self.indices = [{value: index for index, value in enumerate(values)} for values in self.values]
+        self.shifts = []
+        self.field_masks = []
+        shift = 0
+        for values in self.values:
+            width = max(1, (len(values) - 1).bit_length())
+            self.shifts.append(shift)
+            self.field_masks.append(((1 << width) - 1) << shift)
+            shift += width
+        self.fields_cache = dict()
+
+    def encode(self, assignments):
+        mask, code = 0, 0
+        for variable, value in assignments.items():
+            position = self.positions[variable]
+            mask |= 1 << position
+            code |= self.indices[position][value] << self.shifts[position]
+        return mask, code
+
+    def decode(self, mask, code):  # as a dictionary with variables in sorted order
+        assignments = dict()
+        while mask:
+            lowest = mask & -mask
+            mask ^= lowest
+            position = lowest.bit_length() - 1
+            assignments[self.variables[position]] = self.values[position][(code & self.field_masks[position]) >> self.shifts[position]]
+        return assignments
+
+    def fields(self, mask):  # bits of code holding the values of the variables in mask
+        fields = self.fields_cache.get(mask)
+        if fields is None:
+            fields = 0
+            rest = mask
+            while rest:
+                lowest = rest & -rest
+                rest ^= lowest
+                fields |= self.field_masks[lowest.bit_length() - 1]
+            self.fields_cache[mask] = fields
+        return fields
+
+    def exact_codes(self, mask, differing_from=None):  # codes of every assignment to exactly the variables in mask, differing from code differing_from on each of them if given
+        choices = []
+        while mask:
+            lowest = mask & -mask
+            mask ^= lowest
+            position = lowest.bit_length() - 1
+            excluded = None if differing_from is None else (differing_from & self.field_masks[position]) >> self.shifts[position]
+            choices.append([index << self.shifts[position] for index in range(len(self.values[position])) if index != excluded])
+        for parts in itertools.product(*choices):
+            yield sum(parts)
+
+    def restrict(self, code, mask):  # code of the assignments to the variables in mask
+        return code & self.fields(mask)
+
+
+class SubsetIndex:
+    # index over assignments encoded by codec (see AssignmentCodec) answering whether an assignment is part of some indexed assignment,
+    # by intersecting the bitsets of indexed assignments containing each variable=value of the query
+    def __init__(self, codec, assignments=()):
+        self.codec = codec
+        self.members = dict()  # encoded indexed assignments to their bits in the bitsets
+        self.bitsets = dict()  # (position, field of code) of each variable=value to the bitset of indexed assignments containing it
+        for assignment in assignments:
+            self.add(*codec.encode(assignment))
+
+    def add(self, mask, code):
+        if (mask, code) in self.members:
+            return
+        bit = 1 << len(self.members)
+        self.members[mask, code] = bit
+        while mask:
+            lowest = mask & -mask
+            mask ^= lowest
+            position = lowest.bit_length() - 1
+            literal = position, code & self.codec.field_masks[position]
+            self.bitsets[literal] = self.bitsets.get(literal, 0) | bit
+
+    def supersets(self, mask, code):  # bitset of the indexed assignments containing (mask, code)
+        bitset = (1 << len(self.members)) - 1
+        while mask and bitset:
+            lowest = mask & -mask
+            mask ^= lowest
+            position = lowest.bit_length() - 1
+            bitset &= self.bitsets.get((position, code & self.codec.field_masks[position]), 0)
+        return bitset
+
+    def contains(self, assignments):  # whether assignments is part of some indexed assignment
+        try:
+            return bool(self.supersets(*self.codec.encode(assignments)))
+        except KeyError:  # variable or value outside the domains, so not part of any
+            return False
+
+    def contains_each(self, assignments_iter):  # bulk form of contains
+        for assignments in assignments_iter:
+            yield self.contains(assignments)
+
+    def __len__(self):
+        return len(self.members)
+
+
+def submasks(mask):  # non-empty submasks of mask in increasing order, ending with mask itself
+    submask = 0
+    while True:
+        submask = (submask - mask) & mask
+        if not submask:
+            return
+        yield submask
+
+
+def submasks_by_size(mask, max_size=None):  # submasks of mask in nondecreasing order of size, starting with 0, up to max_size bits
+    bits = []
+    while mask:
+        lowest = mask & -mask
+        mask ^= lowest
+        bits.append(lowest)
+    for size in range(len(bits) + 1 if max_size is None else min(len(bits), max_size) + 1):
+        for combination in itertools.combinations(bits, size):
+            yield sum(combination)
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache:  # maxsize=None for unbounded, maxsize=0 to disable
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)  # evict least recently used
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
@@ -8,7 +8,8 @@ setup(
     author="Kevin McAreavey",
     author_email="kevin.mcareavey@bristol.ac.uk",
     license="MIT",
-    install_requires=["frozendict", "networkx", "pygraphviz"],
+    install_requires=["frozendict"],
+    extras_require={"numpy": ["numpy"], "draw": ["networkx", "pygraphviz"]},  # draw for CausalNetwork.write
     classifiers=[],
     include_package_data=True,
     platforms="any",